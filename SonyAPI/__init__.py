@@ -33,7 +33,6 @@ alanreid / bravia
 from __future__ import absolute_import
 import threading
 import base64
-import re
 import sys
 import json
 import time
@@ -42,8 +41,11 @@ import struct
 import requests
 import traceback
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from .version import __version__, __version_info__, __author__
 from . import (
+    rpc,
+    codec,
     application,
     volume,
     media,
@@ -52,9 +54,32 @@ from . import (
     inputs,
     channel,
     speaker,
-    event
+    event,
+    ssdp
 )
 from .logger import LOGGER as _LOGGER
+from .session import SessionPool
+from .cache import (
+    ResponseCache,
+    is_read_only as _is_read_only,
+    request_key as _request_key
+)
+from .singleflight import SingleFlight
+from .command_queue import CommandQueue
+from .timeouts import Timeouts, Deadline
+from .resilience import RetryPolicy, CircuitBreaker
+from .metrics import Metrics, clock as _clock
+from .hooks import Hooks
+from .fleet import Fleet, Batch, Result
+from .properties import (
+    PROPERTIES,
+    group_requests as _group_requests,
+    build_snapshot as _build_snapshot
+)
+from .capabilities import (
+    CapabilityCache,
+    fingerprint as _fingerprint
+)
 from .utils import (
     get_mac_addresses as _get_mac_addresses,
     cache_icons as _cache_icons
@@ -71,6 +96,8 @@ from .exception import (
     RegisterError,
     IRCCError,
     SendError,
+    DeadlineExceededError,
+    CircuitOpenError,
     IPAddressError
 )
 
@@ -90,9 +117,13 @@ from .api_const import (
     HEADER,
     BODY,
     NUMBERS,
+    PROTOCOLS,
     PY30_31
 )
 
+if sys.version_info[:2] >= (3, 6):
+    from .aio import AsyncSonyAPI
+
 try:
     __builtin__ = __import__('__builtin__')
 except ImportError:
@@ -108,6 +139,8 @@ class SonyAPI(object):
     RegisterError = RegisterError
     IRCCError = IRCCError
     SendError = SendError
+    DeadlineExceededError = DeadlineExceededError
+    CircuitOpenError = CircuitOpenError
     IPAddressError = IPAddressError
     UnsupportedError = UnsupportedError
     NotImplementedError = NotImplementedError
@@ -119,10 +152,75 @@ class SonyAPI(object):
         nickname=None,
         pin=0000,
         psk=None,
-        ssdp_timeout=10
+        ssdp_timeout=10,
+        discovery_workers=1,
+        capability_cache=None,
+        response_cache=True,
+        coalesce_reads=True,
+        ircc_interval=0.1,
+        timeout=10.0,
+        retry=True,
+        circuit_breaker=True,
+        collect_stats=False,
+        pool_size=4,
+        pool_idle_timeout=30.0,
+        pool_max_requests=100
     ):
         self._methods = {}
+        self._dispatch = {}
+
+        if not isinstance(timeout, Timeouts):
+            timeout = Timeouts(timeout)
+        self._timeouts = timeout
+
+        if retry is True:
+            retry = RetryPolicy()
+        self._retry_policy = retry or None
+
+        if circuit_breaker is True:
+            circuit_breaker = CircuitBreaker()
+        self._circuit_breaker = circuit_breaker or None
+
+        if collect_stats is True:
+            collect_stats = Metrics()
+        self._metrics = collect_stats or None
+        self._discovery_workers = max(1, discovery_workers)
+        self._discovery_times = {}
+        self._fingerprint = None
+
+        if capability_cache is True:
+            capability_cache = CapabilityCache()
+        elif capability_cache and not isinstance(
+            capability_cache,
+            CapabilityCache
+        ):
+            capability_cache = CapabilityCache(capability_cache)
+        self._capability_cache = capability_cache or None
+
+        if response_cache is True:
+            response_cache = ResponseCache()
+        elif isinstance(response_cache, dict):
+            response_cache = ResponseCache(response_cache)
+        self._response_cache = response_cache or None
+
+        self._command_queue = CommandQueue(self.ircc, ircc_interval)
+
+        if coalesce_reads:
+            self._single_flight = SingleFlight()
+        else:
+            self._single_flight = None
+        self._hooks = Hooks()
+        self._session = SessionPool(
+            pool_size=pool_size,
+            idle_timeout=pool_idle_timeout,
+            max_requests=pool_max_requests,
+            hooks=self._hooks
+        )
         self._remote_command_list = {}
+        self._ircc_payloads = {}
+        self._ircc_headers = dict(HEADER)
+        if psk:
+            self._ircc_headers['X-Auth-PSK'] = psk
         self._ircc_url = 'http://%s/sony/IRCC' % ip_address
         self._access_url = 'http://%s/sony/accessControl' % ip_address
 
@@ -178,7 +276,7 @@ class SonyAPI(object):
         self._psk = psk
         if psk:
             self._pin = pin
-            self._build_command_list()
+            self._load_capabilities()
         else:
             self._pin = None
             self.pin = pin
@@ -197,61 +295,210 @@ class SonyAPI(object):
 
         _LOGGER.file_writer = tmp_debug
 
-    def _build_command_list(self):
-        post = requests.post
+    @property
+    def connection_pool(self):
+        return self._session
 
-        protocols = (
-            'system',
-            'appControl',
-            'videoScreen',
-            'avContent',
-            'audio',
-            'cec',
-            'recording',
-            'browser'
+    def close(self):
+        # stops the command queue and closes the pooled connections
+        self._command_queue.stop()
+        self._session.close()
+
+    @property
+    def hooks(self):
+        return self._hooks
+
+    @property
+    def timeouts(self):
+        return self._timeouts
+
+    @property
+    def retry_policy(self):
+        return self._retry_policy
+
+    @property
+    def circuit_breaker(self):
+        return self._circuit_breaker
+
+    def stats(self):
+        if self._metrics is None:
+            return {}
+        return self._metrics.stats()
+
+    def reset_stats(self):
+        if self._metrics is not None:
+            self._metrics.reset()
+
+    def _circuit_allow(self, name):
+        if self._circuit_breaker is not None:
+            self._circuit_breaker.check(name)
+
+    def _circuit_record(self, success):
+        if self._circuit_breaker is not None:
+            self._circuit_breaker.record(success)
+
+    def _deadline_error(self, name, deadline):
+        _LOGGER.error(name, err='DeadlineExceededError')
+        return DeadlineExceededError(
+            '%s did not respond within %s seconds' % (name, deadline.timeout)
         )
 
-        get_versions = json.dumps(
-            {"id": 1, "method": "getVersions", "version": "1.0", "params": []}
+    def _capability_fingerprint(self):
+        system_information = self._request(
+            'system',
+            'getSystemInformation',
+            '1.0',
+            ['1.0']
         )
-        get_methods = {"id": 1, "method": "getMethodTypes", "version": "1.0"}
+        interface_information = self._request(
+            'system',
+            'getInterfaceInformation',
+            '1.0',
+            ['1.0']
+        )
+        return _fingerprint(system_information, interface_information)
 
-        for protocol in protocols:
-            protocol_container = {}
+    def _load_capabilities(self):
+        if self._capability_cache is None:
+            self._build_command_list()
+            return
 
-            url = 'http://%s/sony/%s' % (self._ip_address, protocol)
-            data = get_versions.encode('UTF-8')
-            try:
-                _LOGGER.debug('<<', url=url, data=data)
-                response = post(url, data=data).content.decode('utf-8')
-                versions = json.loads(response)['result'][0]
-                _LOGGER.debug('>>', protocol=protocol, versions=versions)
-            except (requests.RequestException, KeyError):
-                continue
+        try:
+            self._fingerprint = self._capability_fingerprint()
+        except SonyAPIError:
+            self._fingerprint = None
 
-            for ver in versions:
-                get_methods['params'] = [ver]
-                data = json.dumps(get_methods).encode('UTF-8')
-                try:
-                    _LOGGER.debug('<<', url=url, data=data)
-                    response = post(url, data=data).content.decode('utf-8')
-                    results = json.loads(response)['results']
-
-                    protocol_container[ver] = list(res[0] for res in results)
-                    _LOGGER.debug(
-                        '>>',
-                        protocol=protocol,
-                        methods=protocol_container[ver]
-                    )
-                except (requests.RequestException, KeyError):
-                    continue
+        if self._fingerprint is not None:
+            entry = self._capability_cache.load(self._fingerprint)
+            if entry is not None:
+                self._methods = entry['methods']
+                self._set_command_list(entry['remote_command_list'])
+                self._build_dispatch_index()
+                return
+
+        self._build_command_list()
+
+        try:
+            self._command_list
+        except SonyAPIError:
+            pass
+
+        self._save_capabilities()
+
+    def _save_capabilities(self):
+        if self._capability_cache is not None and self._fingerprint:
+            self._capability_cache.save(
+                self._fingerprint,
+                self._methods,
+                self._remote_command_list
+            )
+
+    @property
+    def discovery_times(self):
+        return dict(self._discovery_times)
 
-            self._methods[protocol] = protocol_container
+    def _probe(self, protocol, method, params):
+        url = 'http://%s/sony/%s' % (self._ip_address, protocol)
+        data = rpc.encode(rpc.build_request(method, '1.0', params))
+
+        start_time = time.time()
+        timeout = self._timeouts.resolve(protocol, method)
+        try:
+            _LOGGER.debug('<<', url=url, data=data)
+            response = self._session.post(
+                url,
+                data=data,
+                timeout=self._timeouts.requests_timeout(timeout),
+                operation=('probe', protocol, method)
+            )
+            response = rpc.decode(response.content)
+            if method == 'getVersions':
+                result = rpc.parse_versions(response)
+            else:
+                result = rpc.parse_methods(response)
             _LOGGER.debug(
-                '||',
+                '>>',
                 protocol=protocol,
-                methods=self._methods[protocol]
+                method=method,
+                result=result
             )
+        except (requests.RequestException, KeyError, ValueError):
+            result = None
+
+        return result, start_time, time.time()
+
+    def _run_probes(self, probes):
+        workers = min(self._discovery_workers, len(probes))
+
+        if workers > 1:
+            executor = ThreadPoolExecutor(max_workers=workers)
+            try:
+                return list(
+                    executor.map(lambda probe: self._probe(*probe), probes)
+                )
+            finally:
+                executor.shutdown()
+
+        return list(self._probe(*probe) for probe in probes)
+
+    def _build_command_list(self):
+        times = dict((protocol, 0.0) for protocol in PROTOCOLS)
+
+        probes = list(
+            (protocol, 'getVersions', []) for protocol in PROTOCOLS
+        )
+        method_probes = []
+
+        for (protocol, _, _), (versions, start_time, end_time) in zip(
+            probes,
+            self._run_probes(probes)
+        ):
+            times[protocol] += end_time - start_time
+            if versions is None:
+                continue
+
+            self._methods[protocol] = {}
+            for ver in versions:
+                method_probes += [(protocol, 'getMethodTypes', [ver])]
+
+        for (protocol, _, params), (methods, start_time, end_time) in zip(
+            method_probes,
+            self._run_probes(method_probes)
+        ):
+            times[protocol] += end_time - start_time
+            if methods is not None:
+                self._methods[protocol][params[0]] = methods
+
+        self._discovery_times = times
+
+        for protocol in PROTOCOLS:
+            if protocol in self._methods:
+                _LOGGER.debug(
+                    '||',
+                    protocol=protocol,
+                    methods=self._methods[protocol],
+                    discovery_time=self._discovery_times[protocol]
+                )
+
+        self._build_dispatch_index()
+
+    def _build_dispatch_index(self):
+        self._dispatch = rpc.build_dispatch_index(self._methods)
+        _LOGGER.debug('||', dispatch_count=len(self._dispatch))
+
+    @property
+    def dispatch_index(self):
+        return dict(self._dispatch)
+
+    def method_version(self, protocol, method):
+        return rpc.lookup(self._dispatch, self._methods, protocol, method)
+
+    def find_method(self, method):
+        return sorted(
+            (protocol, ver)
+            for (protocol, name), ver in self._dispatch.items()
+            if name == method
+        )
 
     @staticmethod
     def debug(writer):
@@ -295,7 +542,7 @@ class SonyAPI(object):
                 self._pin_timer.join(1.0)
                 self._pin_timer = None
 
-            base64string = base64.encodestring(
+            base64string = base64.b64encode(
                 ('%s:%s' % ('', pin)).encode()
             )
             headers = dict(
@@ -316,10 +563,14 @@ class SonyAPI(object):
         )
 
         try:
-            response = requests.post(
+            response = self._session.post(
                 self._access_url,
                 data=authorization,
-                headers=headers
+                headers=headers,
+                timeout=self._timeouts.requests_timeout(
+                    self._timeouts.resolve('accessControl', 'actRegister')
+                ),
+                operation=('register', 'accessControl', 'actRegister')
             )
             response.raise_for_status()
             json_data = response.json()
@@ -333,12 +584,12 @@ class SonyAPI(object):
 
             self._cookies = response.cookies
             self._pin = pin
-            self._build_command_list()
+            self._load_capabilities()
 
         except requests.exceptions.HTTPError as exception_instance:
             if '401' in str(exception_instance):
                 if pin:
-                    _LOGGER.error(traceback.format_exc(), err='PinError')
+                    _LOGGER.error(err='PinError', exc_info=True)
                     raise SonyAPI.PinError(
                         'This device is not registered or the PIN is '
                         'invalid.\n\n'
@@ -367,13 +618,13 @@ class SonyAPI(object):
                     if pin and not timed_out:
                         self.pin = pin
             else:
-                _LOGGER.error(traceback.format_exc(), err='RegisterError')
+                _LOGGER.error(err='RegisterError', exc_info=True)
                 raise SonyAPI.RegisterError(
                     'Unknown HTTP Error: ' + traceback.format_exc()
                 )
 
         except requests.exceptions.RequestException:
-            _LOGGER.error(traceback.format_exc(), err='RegisterError')
+            _LOGGER.error(err='RegisterError', exc_info=True)
             raise SonyAPI.RegisterError(
                 'Unknown Request Error: ' + traceback.format_exc()
             )
@@ -402,98 +653,331 @@ class SonyAPI(object):
         sock.close()
         _LOGGER.debug('WOL Packet Sent')
 
-    def ircc(self, code):
+    def ircc(self, code, timeout=None):
+        if self._metrics is None:
+            return self._ircc(code, timeout)
+
+        start = _clock()
         try:
-            response = requests.post(
+            content = self._ircc(code, timeout)
+        except Exception as err:
+            self._metrics.record('IRCC', 'X_SendIRCC', _clock() - start, err)
+            raise
+
+        self._metrics.record('IRCC', 'X_SendIRCC', _clock() - start)
+        return content
+
+    def _ircc(self, code, timeout):
+        data = self._ircc_payloads.get(code)
+        if data is None:
+            data = rpc.ircc_payload(code)
+
+        deadline = Deadline(
+            self._timeouts.resolve('IRCC', 'X_SendIRCC', timeout)
+        )
+        if deadline.expired:
+            raise self._deadline_error('IRCC', deadline)
+
+        self._circuit_allow('IRCC')
+
+        try:
+            response = self._session.post(
                 self._ircc_url,
-                headers=HEADER,
+                headers=self._ircc_headers,
                 cookies=self._cookies,
-                data=(BODY % code).encode('UTF-8')
+                data=data,
+                timeout=self._timeouts.requests_timeout(deadline.timeout),
+                operation=('ircc', 'IRCC', 'X_SendIRCC')
             )
             content = response.content
-            _LOGGER.debug('>>', content)
-            return content
+
+        except requests.exceptions.Timeout:
+            self._circuit_record(False)
+            raise self._deadline_error('IRCC', deadline)
 
         except requests.exceptions.RequestException:
+            self._circuit_record(False)
             raise SonyAPI.IRCCError(traceback.format_exc())
 
-    def send(self, protocol, method, return_index=0, **params):
-        try:
-            versions = self._methods[protocol]
-        except KeyError:
-            raise UnsupportedError(
-                'Protocol %s is not supported by your TV' % protocol
+        except Exception:
+            # the breaker has to hear how a half open probe went or it
+            # stays half open and turns every request away.
+            self._circuit_record(False)
+            raise
+
+        self._circuit_record(True)
+        _LOGGER.debug('>>', content)
+        rpc.check_ircc_status(response.status_code)
+        return content
+
+    @property
+    def response_cache(self):
+        return self._response_cache
+
+    @property
+    def single_flight(self):
+        return self._single_flight
+
+    def send(
+        self,
+        protocol,
+        method,
+        return_index=0,
+        timeout=None,
+        **params
+    ):
+        version, rpc_params = rpc.build_params(
+            self.method_version(protocol, method),
+            params
+        )
+        cache = self._response_cache
+
+        if not _is_read_only(method):
+            try:
+                return self._request(
+                    protocol,
+                    method,
+                    version,
+                    rpc_params,
+                    return_index,
+                    timeout
+                )
+            finally:
+                # anything that changes the TV may change what a get
+                # returns for the same protocol.
+                if cache is not None:
+                    cache.invalidate(protocol)
+
+        key = _request_key(protocol, method, params, return_index)
+
+        generation = None
+        if cache is not None and cache.ttl(method) > 0:
+            found, result = cache.get(key)
+            if found:
+                return result
+            generation = cache.generation(protocol)
+
+        if self._single_flight is None:
+            return self._cached_read(
+                key,
+                generation,
+                protocol,
+                method,
+                version,
+                rpc_params,
+                return_index,
+                timeout
             )
-        found_version = None
-        for ver in sorted(versions.keys()):
-            if method in versions[ver]:
-                found_version = ver
-        if found_version is None:
-            raise UnsupportedError(
-                'Method %s is not supported by your TV' % method
+
+        return self._single_flight.do(
+            key,
+            self._cached_read,
+            key,
+            generation,
+            protocol,
+            method,
+            version,
+            rpc_params,
+            return_index,
+            timeout
+        )
+
+    def _cached_read(self, key, generation, *args):
+        # the call that sends the request stores the result, it is
+        # dropped when a write invalidated the protocol since the
+        # generation was taken.
+        result = self._read(*args)
+        if generation is not None:
+            self._response_cache.put(key, result, generation)
+        return result
+
+    def _request(
+        self,
+        protocol,
+        method,
+        version,
+        params,
+        return_index=0,
+        timeout=None
+    ):
+        if self._metrics is None:
+            return self._post_request(
+                protocol,
+                method,
+                version,
+                params,
+                return_index,
+                timeout
             )
 
-        if not params:
-            params = [found_version]
-            found_version = '1.0'
-        else:
-            params = [params]
+        start = _clock()
+        try:
+            result = self._post_request(
+                protocol,
+                method,
+                version,
+                params,
+                return_index,
+                timeout
+            )
+        except Exception as err:
+            self._metrics.record(protocol, method, _clock() - start, err)
+            raise
 
-        data = {
-            'method': method,
-            'params': params,
-            'id': 1,
-            'version': found_version
-        }
+        self._metrics.record(protocol, method, _clock() - start)
+        return result
+
+    def _post_request(
+        self,
+        protocol,
+        method,
+        version,
+        params,
+        return_index,
+        timeout
+    ):
+        data = rpc.build_request(method, version, params)
+        name = protocol + '.' + method
+        deadline = Deadline(self._timeouts.resolve(protocol, method, timeout))
 
         _LOGGER.debug('||', json_data=data)
 
-        try:
-            if self._psk is None:
-                header = dict(cookies=self._cookies)
-            else:
-                header = dict(headers={'X-Auth-PSK': self._psk})
+        if self._psk is None:
+            header = dict(cookies=self._cookies)
+        else:
+            header = dict(headers={'X-Auth-PSK': self._psk})
 
-            header['data'] = json.dumps(data).encode('UTF-8')
+        header['data'] = rpc.encode(data)
 
-            _LOGGER.debug('||', header=header)
-            url = 'http://%s/sony/%s' % (self._ip_address, protocol)
-            _LOGGER.debug('<<', url=url, header=header)
-            response = requests.post(url, **header)
-            response = json.loads(response.content.decode('utf-8'))
-            _LOGGER.debug('>>', response=response)
+        url = 'http://%s/sony/%s' % (self._ip_address, protocol)
+        header['timeout'] = self._timeouts.requests_timeout(deadline.timeout)
+        header['operation'] = ('send', protocol, method)
+        _LOGGER.debug('||', header=header)
+        _LOGGER.debug('<<', url=url, header=header)
 
-            err = response.get('error')
+        if deadline.expired:
+            # requests does not take a timeout of 0
+            raise self._deadline_error(name, deadline)
 
-            if err:
-                err_num, err_msg = err
-                if err_num == 501:
-                    _LOGGER.error(err, err='NotImplementedError')
-                    raise NotImplementedError(err_msg)
+        self._circuit_allow(name)
 
-                elif err_num == 15:
-                    _LOGGER.error(err, err='UnsupportedError')
-                    raise UnsupportedError(err_msg)
-                else:
-                    _LOGGER.error(err, err='JSONRequestError')
-                    raise SonyAPI.JSONRequestError(err_num, err_msg)
+        try:
+            response = self._session.post(url, **header)
+            content = response.content
 
-            if isinstance(response['result'], list):
-                return response['result'][return_index]
-            else:
-                return response['result']
+        except requests.exceptions.Timeout:
+            self._circuit_record(False)
+            raise self._deadline_error(name, deadline)
 
         except requests.exceptions.RequestException:
-            _LOGGER.error(traceback.format_exc(), err='SendError')
+            self._circuit_record(False)
+            _LOGGER.error(err='SendError', exc_info=True)
             raise SonyAPI.SendError(traceback.format_exc())
 
+        except Exception:
+            self._circuit_record(False)
+            raise
+
+        self._circuit_record(True)
+
+        # the timeout given to requests is per read, a response that
+        # trickles in can take longer. A late get is dropped, anything
+        # else has already been done by the TV so the response is kept.
+        if deadline.expired and _is_read_only(method):
+            raise self._deadline_error(name, deadline)
+
+        response = rpc.decode_response(response.status_code, content, name)
+        _LOGGER.debug('>>', response=response)
+
+        return rpc.parse_response(response, return_index)
+
+    def _read(
+        self,
+        protocol,
+        method,
+        version,
+        params,
+        return_index=0,
+        timeout=None
+    ):
+        # get requests do not change the TV so they are safe to send
+        # again after a transport failure.
+        if self._retry_policy is None:
+            return self._request(
+                protocol,
+                method,
+                version,
+                params,
+                return_index,
+                timeout
+            )
+
+        # the timeout covers all of the attempts and the waits between
+        # them, not each attempt.
+        deadline = Deadline(self._timeouts.resolve(protocol, method, timeout))
+        delays = self._retry_policy.delays()
+        while True:
+            try:
+                return self._request(
+                    protocol,
+                    method,
+                    version,
+                    params,
+                    return_index,
+                    deadline.remaining
+                )
+            except (CircuitOpenError, DeadlineExceededError):
+                raise
+            except SendError:
+                delay = next(delays, None)
+                if delay is None or (
+                    deadline.expires is not None and
+                    delay >= deadline.remaining
+                ):
+                    raise
+
+                _LOGGER.debug(
+                    '||',
+                    retry=protocol + '.' + method,
+                    delay=delay
+                )
+                time.sleep(delay)
+                if deadline.expired:
+                    raise
+
+    def snapshot(self, names=None, workers=8):
+        if names is None:
+            names = sorted(PROPERTIES.keys())
+
+        groups = _group_requests(names)
+
+        def fetch(key):
+            try:
+                return self.send(*key), None
+            except SonyAPIError as err:
+                return None, err
+
+        keys = list(groups.keys())
+        workers = min(workers, len(keys))
+
+        if workers > 1:
+            executor = ThreadPoolExecutor(max_workers=workers)
+            try:
+                results = list(executor.map(fetch, keys))
+            finally:
+                executor.shutdown()
+        else:
+            results = list(fetch(key) for key in keys)
+
+        return _build_snapshot(groups, results)
+
     @property
     def cache_icons(self):
         return self._cache_icons
 
     @cache_icons.setter
     def cache_icons(self, flag):
-        if self._icon_thread is not None and self._icon_thread.isAlive():
+        if self._icon_thread is not None and self._icon_thread.is_alive():
             self._icon_event.set()
             self._icon_thread.join(3.0)
 
@@ -504,9 +988,10 @@ class SonyAPI(object):
             self._icon_event.clear()
             self._icon_thread = threading.Thread(
                 target=_cache_icons,
-                args=(self, self._icon_event
-                )
+                args=(self, self._icon_event)
             )
+            self._icon_thread.daemon = True
+            self._icon_thread.start()
 
     @property
     def volume(self):
@@ -694,7 +1179,7 @@ class SonyAPI(object):
 
     @property
     def cid(self):
-        return self._system_information['language']
+        return self._system_information['cid']
 
     @property
     def generation(self):
@@ -963,17 +1448,26 @@ class SonyAPI(object):
 
     @property
     def source_list(self):
-        statuses = self._sony_api.send(
+        statuses = self.send(
             'avContent',
             'getCurrentExternalInputsStatus'
         )
         for scheme in self.scheme_list:
             sources = self.send('avContent', 'getSourceList', scheme=scheme)
             for source in sources:
-                yield inputs.InputItem(self, **source)
+                uri = source['source']
                 for status in statuses:
-                    if scheme in status['uri']:
-                        yield inputs.InputItem(self, **status)
+                    if status['uri'] == uri:
+                        break
+                else:
+                    status = dict(
+                        title=uri,
+                        uri=uri,
+                        label=uri,
+                        icon=None,
+                        connection=None
+                    )
+                yield inputs.InputItem(self, uri, status)
 
     @property
     def content_count(self):
@@ -1174,23 +1668,57 @@ class SonyAPI(object):
                 return_index=1
             )
 
-            self._remote_command_list = dict(list(
-                (command['name'], command['value'])
-                for command in result
-            ))
+            self._set_command_list(rpc.parse_command_list(result))
         return self._remote_command_list
 
+    def _set_command_list(self, command_list):
+        # the IRCC request bodies are built once so sending a key press
+        # is a dict lookup.
+        self._ircc_payloads = rpc.ircc_payloads(command_list)
+        self._remote_command_list = command_list
+
     def refresh_command_list(self):
         self._remote_command_list = {}
-        return self._command_list
+        if self._response_cache is not None:
+            self._response_cache.invalidate(
+                'system',
+                'getRemoteControllerInfo'
+            )
+        command_list = self._command_list
+        self._save_capabilities()
+        return command_list
+
+    def refresh_capabilities(self):
+        self._methods = {}
+        self._remote_command_list = {}
+        if self._response_cache is not None:
+            self._response_cache.invalidate()
+        if self._capability_cache is not None and self._fingerprint:
+            self._capability_cache.remove(self._fingerprint)
+        self._load_capabilities()
+
+    @property
+    def command_queue(self):
+        return self._command_queue
+
+    def queue_commands(self, *command_names):
+        codes = []
+        for command_name in command_names:
+            try:
+                codes += [self._command_list[command_name]]
+            except KeyError:
+                raise SonyAPI.CommandError(
+                    'This device does not support command ' + command_name
+                )
+
+        return self._command_queue.put(*codes)
 
     def send_command(self, command_name):
-        try:
-            self.ircc(self._command_list[command_name])
-        except KeyError:
-            raise SonyAPI.CommandError(
-                'This device does not support command ' + command_name
-            )
+        batch = self.queue_commands(command_name)
+        batch.wait()
+
+        if batch.errors:
+            raise batch.errors[0][1]
 
     @property
     def volume_data(self):
@@ -1253,33 +1781,16 @@ class SonyAPI(object):
         )
 
     @staticmethod
-    def discover(timeout=30.0):
-
-        start_time = time.time()
+    def discover(timeout=30.0, max_devices=None, idle_timeout=None):
+        # see ssdp.Discovery for searching on more than one interface
+        # or getting the TVs as they answer.
         found_addresses = []
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.settimeout(timeout)
-        dest = socket.gethostbyname(SSDP_ADDR)
-        sock.sendto(SSDP_REQUEST, (dest, SSDP_PORT))
-        sock.settimeout(timeout)
 
-        while time.time() - start_time < timeout:
-            try:
-                data = sock.recv(1000)
-            except socket.timeout:
-                break
-
-            response = data.decode('utf-8')
-            match = re.search(
-                r"\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b",
-                response
-            )
-            if match:
-                address = match.group()
-                if address not in found_addresses:
-                    found_addresses += [address]
-        _LOGGER.debug('||', found_addresses=found_addresses)
+        for device in ssdp.discover(timeout, max_devices, idle_timeout):
+            if device.address not in found_addresses:
+                found_addresses += [device.address]
 
+        _LOGGER.debug('||', found_addresses=found_addresses)
         return found_addresses
 
     def register_event_callback(self, callback):
@@ -1287,10 +1798,21 @@ class SonyAPI(object):
             for thread in self._event_threads:
                 thread.add_callback(callback)
         else:
-            rendering = event.RenderingControl(self._ip_address)
-            av = event.AVTransport(self._ip_address)
-            connection = event.ConnectionManager(self._ip_address)
-            ircc = event.IRCC(self._ip_address)
+            timeout = self._timeouts.requests_timeout(
+                self._timeouts.resolve('upnp', 'SUBSCRIBE')
+            )
+            rendering = event.RenderingControl(
+                self._ip_address,
+                self._session,
+                timeout
+            )
+            av = event.AVTransport(self._ip_address, self._session, timeout)
+            connection = event.ConnectionManager(
+                self._ip_address,
+                self._session,
+                timeout
+            )
+            ircc = event.IRCC(self._ip_address, self._session, timeout)
 
             rendering.add_callback(callback)
             av.add_callback(callback)
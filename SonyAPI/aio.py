@@ -0,0 +1,1165 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# asyncio version of SonyAPI. Python 3.6+ only, the HTTP client is built
+# on asyncio streams so no third party event loop or library is needed.
+
+import time
+import base64
+import socket
+import asyncio
+import traceback
+from urllib.parse import urlsplit
+
+from . import rpc, media, inputs, application, recording
+from .logger import LOGGER as _LOGGER
+from .cache import is_read_only
+from .timeouts import Timeouts, Deadline
+from .resilience import RetryPolicy, CircuitBreaker
+from .metrics import Metrics, clock as _clock
+from .hooks import Hooks
+from .properties import PROPERTIES, group_requests, build_snapshot
+from .api_const import GUID, PROTOCOLS, HEADER
+from .exception import (
+    SonyAPIError,
+    PinError,
+    RegisterTimeoutError,
+    NotImplementedError,
+    UnsupportedError,
+    JSONRequestError,
+    CommandError,
+    VolumeDeviceError,
+    RegisterError,
+    IRCCError,
+    SendError,
+    DeadlineExceededError,
+    CircuitOpenError,
+    IPAddressError
+)
+
+_TRANSPORT_ERRORS = (OSError, asyncio.IncompleteReadError, ValueError)
+
+
+class AsyncResponse(object):
+
+    def __init__(self, status, reason, headers, cookies, content):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.cookies = cookies
+        self.content = content
+
+    @property
+    def status_code(self):
+        return self.status
+
+
+class _AsyncConnection(object):
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.request_count = 0
+        self.last_used = time.time()
+
+    def close(self):
+        self.writer.close()
+
+
+async def _read_response(reader, method):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError('Connection closed by the TV')
+
+    version, status, reason = (
+        status_line.decode('latin-1').rstrip('\r\n').split(' ', 2) + ['']
+    )[:3]
+    status = int(status)
+
+    headers = {}
+    cookies = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, value = line.decode('latin-1').split(':', 1)
+        key = key.strip().lower()
+        value = value.strip()
+        if key == 'set-cookie':
+            cookie = value.split(';', 1)[0]
+            if '=' in cookie:
+                name, cookie = cookie.split('=', 1)
+                cookies[name.strip()] = cookie.strip()
+        headers[key] = value
+
+    keep_alive = (
+        version == 'HTTP/1.1' and
+        headers.get('connection', '').lower() != 'close'
+    )
+
+    if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+        content = b''
+    elif headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';', 1)[0], 16)
+            if not size:
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            chunks += [await reader.readexactly(size)]
+            await reader.readline()
+        content = b''.join(chunks)
+    elif 'content-length' in headers:
+        content = await reader.readexactly(int(headers['content-length']))
+    else:
+        content = await reader.read()
+        keep_alive = False
+
+    return (
+        AsyncResponse(status, reason, headers, cookies, content),
+        keep_alive
+    )
+
+
+class AsyncSessionPool(object):
+
+    def __init__(
+        self,
+        pool_size=4,
+        idle_timeout=30.0,
+        max_requests=100,
+        hooks=None
+    ):
+        self.hooks = hooks
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+        self.hits = 0
+        self.misses = 0
+        self._idle = {}
+
+    def _expired(self, connection, now):
+        idle_time = now - connection.last_used
+        if self.idle_timeout and idle_time > self.idle_timeout:
+            return True
+
+        request_count = connection.request_count
+        if self.max_requests and request_count >= self.max_requests:
+            return True
+
+        return False
+
+    async def _acquire(self, host, port):
+        now = time.time()
+        idle = self._idle.get((host, port), [])
+
+        while idle:
+            connection = idle.pop()
+            if self._expired(connection, now):
+                connection.close()
+            else:
+                self.hits += 1
+                return connection, True
+
+        self.misses += 1
+        reader, writer = await asyncio.open_connection(host, port)
+        return _AsyncConnection(reader, writer), False
+
+    def _release(self, host, port, connection, reusable):
+        connection.request_count += 1
+        connection.last_used = time.time()
+
+        if reusable and not self._expired(connection, connection.last_used):
+            idle = self._idle.setdefault((host, port), [])
+            if len(idle) < self.pool_size:
+                idle.append(connection)
+                return
+
+        connection.close()
+
+    async def request(
+        self,
+        method,
+        url,
+        headers=None,
+        data=b'',
+        operation=None
+    ):
+        # operation is (kind, protocol, method), it is used by the hooks
+        # and to tell if the request can safely be sent a second time.
+        idempotent = method in ('GET', 'HEAD') or (
+            operation is not None and
+            operation[0] in ('send', 'probe') and
+            is_read_only(operation[2])
+        )
+
+        hooks = self.hooks
+        if not hooks:
+            return await self._request(method, url, headers, data, idempotent)
+
+        payload = hooks.start(method, url, operation, data)
+        try:
+            response = await self._request(
+                method,
+                url,
+                headers,
+                data,
+                idempotent
+            )
+        except BaseException as err:
+            hooks.end(payload, error=err)
+            raise
+
+        hooks.end(payload, response)
+        return response
+
+    async def _request(self, method, url, headers, data, idempotent):
+        parts = urlsplit(url)
+        host = parts.hostname
+        port = parts.port or 80
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        lines = [
+            '%s %s HTTP/1.1' % (method, path),
+            'Host: %s' % parts.netloc,
+            'Content-Length: %d' % len(data),
+            'Connection: keep-alive'
+        ]
+        for key, value in (headers or {}).items():
+            lines += ['%s: %s' % (key, value)]
+        request = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + data
+
+        # The TV drops idle keep-alive connections. A reused connection
+        # the TV has already closed, or one that fails while the request
+        # is written, is thrown away and the request goes out on the next
+        # idle connection or a new one, at most once per idle connection
+        # in the pool. Once the request is written the TV may have acted
+        # on it, so a failure while reading the response is only retried
+        # for GET and the get* JSON-RPC methods, a keypress or a set* call
+        # is never sent twice.
+        while True:
+            connection, reused = await self._acquire(host, port)
+            if reused and connection.reader.at_eof():
+                self._release(host, port, connection, False)
+                continue
+
+            written = False
+            try:
+                connection.writer.write(request)
+                await connection.writer.drain()
+                written = True
+                response, keep_alive = await _read_response(
+                    connection.reader,
+                    method
+                )
+            except _TRANSPORT_ERRORS:
+                self._release(host, port, connection, False)
+                if reused and (idempotent or not written):
+                    continue
+                raise
+            except BaseException:
+                # cancelled part way through a request (deadline), the
+                # connection can not be used again.
+                self._release(host, port, connection, False)
+                raise
+
+            self._release(host, port, connection, keep_alive)
+            return response
+
+    async def post(self, url, headers=None, data=b'', operation=None):
+        return await self.request('POST', url, headers, data, operation)
+
+    async def get(self, url, headers=None, operation=None):
+        return await self.request('GET', url, headers, b'', operation)
+
+    def stats(self):
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            idle=sum(len(idle) for idle in self._idle.values()),
+            pool_size=self.pool_size
+        )
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def close(self):
+        for idle in self._idle.values():
+            for connection in idle:
+                connection.close()
+        self._idle.clear()
+
+
+class AsyncSonyAPI(object):
+    PinError = PinError
+    RegisterTimeoutError = RegisterTimeoutError
+    JSONRequestError = JSONRequestError
+    CommandError = CommandError
+    VolumeDeviceError = VolumeDeviceError
+    RegisterError = RegisterError
+    IRCCError = IRCCError
+    SendError = SendError
+    DeadlineExceededError = DeadlineExceededError
+    CircuitOpenError = CircuitOpenError
+    IPAddressError = IPAddressError
+    UnsupportedError = UnsupportedError
+    NotImplementedError = NotImplementedError
+
+    def __init__(
+        self,
+        ip_address,
+        nickname=None,
+        pin=None,
+        psk=None,
+        discovery_workers=8,
+        timeout=10.0,
+        retry=True,
+        circuit_breaker=True,
+        collect_stats=False,
+        pool_size=4,
+        pool_idle_timeout=30.0,
+        pool_max_requests=100
+    ):
+        if not ip_address:
+            raise IPAddressError('')
+
+        self._ip_address = ip_address
+        self._ircc_url = 'http://%s/sony/IRCC' % ip_address
+        self._access_url = 'http://%s/sony/accessControl' % ip_address
+        self._nickname = nickname
+        self._pin = pin
+        self._psk = psk
+        self._cookies = {}
+        self._methods = {}
+        self._dispatch = {}
+        self._remote_command_list = {}
+        self._ircc_payloads = {}
+        self._ircc_headers = None
+        self._discovery_workers = max(1, discovery_workers)
+
+        if not isinstance(timeout, Timeouts):
+            timeout = Timeouts(timeout)
+        self._timeouts = timeout
+
+        if retry is True:
+            retry = RetryPolicy()
+        self._retry_policy = retry or None
+
+        if circuit_breaker is True:
+            circuit_breaker = CircuitBreaker()
+        self._circuit_breaker = circuit_breaker or None
+
+        if collect_stats is True:
+            collect_stats = Metrics()
+        self._metrics = collect_stats or None
+
+        self._hooks = Hooks()
+        self._session = AsyncSessionPool(
+            pool_size=pool_size,
+            idle_timeout=pool_idle_timeout,
+            max_requests=pool_max_requests,
+            hooks=self._hooks
+        )
+
+        # used by application.Application
+        self.cache_icons = False
+        self.icon_cache = {}
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *_):
+        self.close()
+
+    @property
+    def connection_pool(self):
+        return self._session
+
+    @property
+    def hooks(self):
+        return self._hooks
+
+    @property
+    def timeouts(self):
+        return self._timeouts
+
+    @property
+    def retry_policy(self):
+        return self._retry_policy
+
+    @property
+    def circuit_breaker(self):
+        return self._circuit_breaker
+
+    def stats(self):
+        if self._metrics is None:
+            return {}
+        return self._metrics.stats()
+
+    def reset_stats(self):
+        if self._metrics is not None:
+            self._metrics.reset()
+
+    def _circuit_allow(self, name):
+        if self._circuit_breaker is not None:
+            self._circuit_breaker.check(name)
+
+    def _circuit_record(self, success):
+        if self._circuit_breaker is not None:
+            self._circuit_breaker.record(success)
+
+    async def _post(
+        self,
+        kind,
+        protocol,
+        method,
+        url,
+        headers,
+        data,
+        timeout=None
+    ):
+        timeout = self._timeouts.resolve(protocol, method, timeout)
+        if timeout is not None and timeout <= 0:
+            _LOGGER.error(protocol + '.' + method, err='DeadlineExceededError')
+            raise DeadlineExceededError(
+                '%s.%s did not respond within %s seconds' %
+                (protocol, method, timeout)
+            )
+
+        try:
+            return await asyncio.wait_for(
+                self._session.post(
+                    url,
+                    headers,
+                    data,
+                    (kind, protocol, method)
+                ),
+                timeout
+            )
+        except asyncio.TimeoutError:
+            _LOGGER.error(protocol + '.' + method, err='DeadlineExceededError')
+            raise DeadlineExceededError(
+                '%s.%s did not respond within %s seconds' %
+                (protocol, method, timeout)
+            )
+
+    @property
+    def pin(self):
+        return self._pin
+
+    def is_connected(self):
+        return bool(self._methods)
+
+    async def connect(self):
+        if self._psk is None:
+            await self._register()
+        await self._build_command_list()
+
+    def close(self):
+        self._session.close()
+
+    async def _register(self):
+        if self._nickname is None:
+            self._nickname = socket.gethostbyaddr(socket.gethostname())[0]
+
+        params = [{
+            'clientid': self._nickname + ':' + GUID,
+            'nickname': self._nickname,
+            'level': 'private'
+        }]
+        params += [[{'value': 'yes', 'function': 'WOL'}]]
+        data = rpc.encode(rpc.build_request('actRegister', '1.0', params))
+
+        headers = {}
+        if self._pin:
+            auth = base64.b64encode(('%s:%s' % ('', self._pin)).encode())
+            headers['Authorization'] = 'Basic ' + auth.decode()
+
+        try:
+            response = await self._post(
+                'register',
+                'accessControl',
+                'actRegister',
+                self._access_url,
+                headers,
+                data
+            )
+        except _TRANSPORT_ERRORS:
+            _LOGGER.error(err='RegisterError', exc_info=True)
+            raise RegisterError(
+                'Unknown Request Error: ' + traceback.format_exc()
+            )
+
+        if response.status == 401:
+            raise PinError(
+                'This device is not registered or the PIN is invalid.\n\n'
+            )
+        if response.status >= 400:
+            raise RegisterError(
+                'Unknown HTTP Error: %d %s' %
+                (response.status, response.reason)
+            )
+
+        if response.content:
+            err = rpc.decode(response.content).get('error')
+            if err:
+                _LOGGER.error(err, err='JSONRequestError')
+                raise JSONRequestError(*err)
+
+        self._cookies.update(response.cookies)
+        self._ircc_headers = None
+
+    def _headers(self):
+        if self._psk is not None:
+            return {'X-Auth-PSK': self._psk}
+        if self._cookies:
+            return {
+                'Cookie': '; '.join(
+                    '%s=%s' % item for item in self._cookies.items()
+                )
+            }
+        return {}
+
+    async def _probe(self, semaphore, protocol, method, params):
+        url = 'http://%s/sony/%s' % (self._ip_address, protocol)
+        data = rpc.encode(rpc.build_request(method, '1.0', params))
+
+        async with semaphore:
+            try:
+                response = await self._post(
+                    'probe',
+                    protocol,
+                    method,
+                    url,
+                    None,
+                    data
+                )
+                response = rpc.decode(response.content)
+                if method == 'getVersions':
+                    return rpc.parse_versions(response)
+                return rpc.parse_methods(response)
+            except _TRANSPORT_ERRORS + (KeyError, SonyAPIError):
+                return None
+
+    async def _build_command_list(self):
+        semaphore = asyncio.Semaphore(self._discovery_workers)
+
+        versions = await asyncio.gather(*list(
+            self._probe(semaphore, protocol, 'getVersions', [])
+            for protocol in PROTOCOLS
+        ))
+
+        probes = []
+        for protocol, protocol_versions in zip(PROTOCOLS, versions):
+            if protocol_versions is None:
+                continue
+            self._methods[protocol] = {}
+            for ver in protocol_versions:
+                probes += [(protocol, ver)]
+
+        methods = await asyncio.gather(*list(
+            self._probe(semaphore, protocol, 'getMethodTypes', [ver])
+            for protocol, ver in probes
+        ))
+
+        for (protocol, ver), protocol_methods in zip(probes, methods):
+            if protocol_methods is not None:
+                self._methods[protocol][ver] = protocol_methods
+
+        self._dispatch = rpc.build_dispatch_index(self._methods)
+        _LOGGER.debug('||', methods=self._methods)
+
+    @property
+    def dispatch_index(self):
+        return dict(self._dispatch)
+
+    def method_version(self, protocol, method):
+        return rpc.lookup(self._dispatch, self._methods, protocol, method)
+
+    def find_method(self, method):
+        return sorted(
+            (protocol, ver)
+            for (protocol, name), ver in self._dispatch.items()
+            if name == method
+        )
+
+    async def _request(
+        self,
+        protocol,
+        method,
+        version,
+        params,
+        return_index=0,
+        timeout=None
+    ):
+        if self._metrics is None:
+            return await self._post_request(
+                protocol,
+                method,
+                version,
+                params,
+                return_index,
+                timeout
+            )
+
+        start = _clock()
+        try:
+            result = await self._post_request(
+                protocol,
+                method,
+                version,
+                params,
+                return_index,
+                timeout
+            )
+        except Exception as err:
+            self._metrics.record(protocol, method, _clock() - start, err)
+            raise
+
+        self._metrics.record(protocol, method, _clock() - start)
+        return result
+
+    async def _post_request(
+        self,
+        protocol,
+        method,
+        version,
+        params,
+        return_index,
+        timeout
+    ):
+        url = 'http://%s/sony/%s' % (self._ip_address, protocol)
+        data = rpc.encode(rpc.build_request(method, version, params))
+        _LOGGER.debug('<<', url=url, data=data)
+
+        self._circuit_allow(protocol + '.' + method)
+
+        try:
+            response = await self._post(
+                'send',
+                protocol,
+                method,
+                url,
+                self._headers(),
+                data,
+                timeout
+            )
+        except DeadlineExceededError:
+            self._circuit_record(False)
+            raise
+        except _TRANSPORT_ERRORS:
+            self._circuit_record(False)
+            _LOGGER.error(err='SendError', exc_info=True)
+            raise SendError(traceback.format_exc())
+        except BaseException:
+            # cancelled or anything else, the breaker has to hear how a
+            # half open probe went or it turns every request away.
+            self._circuit_record(False)
+            raise
+
+        self._circuit_record(True)
+
+        response = rpc.decode_response(
+            response.status,
+            response.content,
+            protocol + '.' + method
+        )
+        _LOGGER.debug('>>', response=response)
+        return rpc.parse_response(response, return_index)
+
+    async def send(
+        self,
+        protocol,
+        method,
+        return_index=0,
+        timeout=None,
+        **params
+    ):
+        version, params = rpc.build_params(
+            self.method_version(protocol, method),
+            params
+        )
+
+        if self._retry_policy is None or not is_read_only(method):
+            return await self._request(
+                protocol,
+                method,
+                version,
+                params,
+                return_index,
+                timeout
+            )
+
+        # the timeout covers all of the attempts and the waits between
+        # them, not each attempt.
+        deadline = Deadline(self._timeouts.resolve(protocol, method, timeout))
+        delays = self._retry_policy.delays()
+        while True:
+            try:
+                return await self._request(
+                    protocol,
+                    method,
+                    version,
+                    params,
+                    return_index,
+                    deadline.remaining
+                )
+            except (CircuitOpenError, DeadlineExceededError):
+                raise
+            except SendError:
+                delay = next(delays, None)
+                if delay is None or (
+                    deadline.expires is not None and
+                    delay >= deadline.remaining
+                ):
+                    raise
+
+                _LOGGER.debug(
+                    '||',
+                    retry=protocol + '.' + method,
+                    delay=delay
+                )
+                await asyncio.sleep(delay)
+                if deadline.expired:
+                    raise
+
+    async def ircc(self, code, timeout=None):
+        if self._metrics is None:
+            return await self._ircc(code, timeout)
+
+        start = _clock()
+        try:
+            content = await self._ircc(code, timeout)
+        except Exception as err:
+            self._metrics.record('IRCC', 'X_SendIRCC', _clock() - start, err)
+            raise
+
+        self._metrics.record('IRCC', 'X_SendIRCC', _clock() - start)
+        return content
+
+    async def _ircc(self, code, timeout):
+        data = self._ircc_payloads.get(code)
+        if data is None:
+            data = rpc.ircc_payload(code)
+
+        if self._ircc_headers is None:
+            self._ircc_headers = dict(HEADER)
+            self._ircc_headers.update(self._headers())
+
+        self._circuit_allow('IRCC')
+
+        try:
+            response = await self._post(
+                'ircc',
+                'IRCC',
+                'X_SendIRCC',
+                self._ircc_url,
+                self._ircc_headers,
+                data,
+                timeout
+            )
+        except DeadlineExceededError:
+            self._circuit_record(False)
+            raise
+        except _TRANSPORT_ERRORS:
+            self._circuit_record(False)
+            raise IRCCError(traceback.format_exc())
+        except BaseException:
+            self._circuit_record(False)
+            raise
+
+        self._circuit_record(True)
+
+        _LOGGER.debug('>>', response.content)
+        rpc.check_ircc_status(response.status)
+        return response.content
+
+    async def _command_list(self):
+        if not self._remote_command_list:
+            result = await self.send(
+                'system',
+                'getRemoteControllerInfo',
+                return_index=1
+            )
+            command_list = rpc.parse_command_list(result)
+            self._ircc_payloads = rpc.ircc_payloads(command_list)
+            self._remote_command_list = command_list
+        return self._remote_command_list
+
+    async def command_list(self):
+        return list((await self._command_list()).keys())
+
+    async def refresh_command_list(self):
+        self._remote_command_list = {}
+        return await self._command_list()
+
+    async def send_command(self, command_name):
+        try:
+            code = (await self._command_list())[command_name]
+        except KeyError:
+            raise CommandError(
+                'This device does not support command ' + command_name
+            )
+        return await self.ircc(code)
+
+    async def get(self, name):
+        try:
+            prop = PROPERTIES[name]
+        except KeyError:
+            raise AttributeError(
+                '%s.%s does not have attribute %s' %
+                (__name__, self.__class__.__name__, name)
+            )
+
+        try:
+            result = await self.send(prop.protocol, prop.method)
+        except SonyAPIError as err:
+            return prop.handle_error(err)
+
+        return prop.extract(result)
+
+    async def snapshot(self, names=None, workers=8):
+        if names is None:
+            names = sorted(PROPERTIES.keys())
+
+        groups = group_requests(names)
+        semaphore = asyncio.Semaphore(max(1, workers))
+
+        async def fetch(key):
+            async with semaphore:
+                try:
+                    return await self.send(*key), None
+                except SonyAPIError as err:
+                    return None, err
+
+        results = await asyncio.gather(*list(fetch(key) for key in groups))
+        return build_snapshot(groups, results)
+
+    async def now_playing(self):
+        result = await self.send('avContent', 'getPlayingContentInfo')
+        sources = [source async for source in self.source_list()]
+        return AsyncNowPlaying(self, sources=sources, **result)
+
+    async def scheme_list(self):
+        for scheme in await self.send('avContent', 'getSchemeList'):
+            yield scheme['scheme']
+
+    async def source_list(self):
+        statuses = await self.send(
+            'avContent',
+            'getCurrentExternalInputsStatus'
+        )
+
+        async for scheme in self.scheme_list():
+            sources = await self.send(
+                'avContent',
+                'getSourceList',
+                scheme=scheme
+            )
+            for source in sources:
+                uri = source['source']
+                for status in statuses:
+                    if status['uri'] == uri:
+                        break
+                else:
+                    status = dict(
+                        title=uri,
+                        uri=uri,
+                        label=uri,
+                        icon=None,
+                        connection=None
+                    )
+                yield AsyncInputItem(self, uri, status)
+
+    async def recording_schedule_list(self):
+        results = await self.send('recording', 'getScheduleList')
+        return list(
+            AsyncScheduleItem(self, **result)
+            for result in results
+        )
+
+    async def application_list(self):
+        for app in await self.send('appControl', 'getApplicationList'):
+            yield AsyncApplication(self, **app)
+
+    async def content_list(self):
+        sources = [source async for source in self.source_list()]
+
+        async def get(source):
+            try:
+                return await self.send(
+                    'avContent',
+                    'getContentList',
+                    source=source.uri
+                )
+            except JSONRequestError:
+                return []
+
+        results = await asyncio.gather(*list(get(s) for s in sources))
+
+        for source, content_list in zip(sources, results):
+            for content in content_list:
+                content['source'] = source
+                yield AsyncContentItem(self, **content)
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, self._ip_address)
+
+
+# The model classes of the blocking API with every method that talks to
+# the TV made a coroutine. Properties that send a request (content,
+# connection) return an awaitable.
+
+class AsyncInputItem(inputs.InputItem):
+
+    async def set(self):
+        return await self._sony_api.send(
+            'avContent',
+            'setPlayContent',
+            uri=self.uri
+        )
+
+    @property
+    def content(self):
+        return self._content()
+
+    async def _content(self):
+        content_list = await self._sony_api.send(
+            'avContent',
+            'getContentList',
+            source=self.uri
+        )
+        content_items = []
+        for content in content_list:
+            content['source'] = self
+            content_items += [AsyncContentItem(self._sony_api, **content)]
+        return content_items
+
+    @property
+    def connection(self):
+        return self._connection()
+
+    async def _connection(self):
+        return (await self._status)['connection']
+
+    @property
+    def _status(self):
+        return self._get_status()
+
+    async def _get_status(self):
+        results = await self._sony_api.send(
+            'avContent',
+            'getCurrentExternalInputsStatus'
+        )
+
+        for result in results:
+            if result['uri'] == self._source:
+                return result
+        return dict(
+            title=self._source,
+            uri=self._source,
+            label=self._source,
+            icon=None,
+            connection=None
+        )
+
+
+class AsyncScheduleItem(recording.ScheduleItem):
+
+    async def delete(self):
+        return await self._sony_api.send(
+            'recording',
+            'deleteSchedule',
+            title=self.title,
+            durationSec=self._duration,
+            uri=self.uri,
+            startDateTime=self._start_date_time,
+            type=self.type,
+            id=self.id
+        )
+
+
+class _AsyncContent(object):
+
+    async def tv_content_visibility(
+        self,
+        visibility=None,
+        surfing_visibility=None,
+        epg_visibility=None
+    ):
+        if isinstance(self.source, inputs.InputItem):
+            source = self.source.uri
+        else:
+            source = self.source
+
+        if not source.startswith('tv'):
+            raise NotImplementedError('')
+
+        if visibility is None:
+            visibility = self.visibility
+        if surfing_visibility is None:
+            surfing_visibility = self.surfing_visibility
+        if epg_visibility is None:
+            epg_visibility = self.epg_visibility
+
+        await self._sony_api.send(
+            'avContent',
+            'setTvContentVisibility',
+            channelSurfingVisibility=surfing_visibility,
+            uri=self.uri,
+            visibility=visibility,
+            epgVisibility=epg_visibility
+        )
+
+    async def delete_protection(self, enable):
+        await self._sony_api.send(
+            'avContent',
+            'setDeleteProtection',
+            isProtected=enable,
+            uri=self.uri
+        )
+
+    async def add_recording_schedule(self, quality, repeat_type):
+        await self._sony_api.send(
+            'recording',
+            'addSchedule',
+            title=self.title,
+            quality=quality,
+            durationSec=self._duration,
+            uri=self.uri,
+            startDateTime=self._start_date_time,
+            repeatType=repeat_type,
+        )
+
+        for item in await self._sony_api.recording_schedule_list():
+            if media._compare(self, item):
+                return item
+
+    async def remove_recording_schedule(self):
+        for item in await self._sony_api.recording_schedule_list():
+            if media._compare(self, item):
+                await item.delete()
+
+
+class AsyncContentItem(_AsyncContent, media.ContentItem):
+
+    async def set(self):
+        if 'tv' in self.uri:
+            return await self._sony_api.send(
+                'avContent',
+                'setPlayTvContent',
+                channel=str(self.display_num)
+            )
+        return await self._sony_api.send(
+            'avContent',
+            'setPlayContent',
+            uri=self.uri
+        )
+
+    async def delete(self):
+        return await self._sony_api.send(
+            'avContent',
+            'deleteContent',
+            uri=self.uri
+        )
+
+
+class AsyncNowPlaying(_AsyncContent, media.NowPlaying):
+    pass
+
+
+class AsyncApplication(application.Application):
+
+    def __init__(self, sony_api, title='', uri='', data='', icon=''):
+        # icons are not downloaded, only ones that are already in
+        # icon_cache are used.
+        self._sony_api = sony_api
+        self.title = title
+        self.data = data
+        self.uri = uri
+        self.icon = icon
+        self.display_icon = sony_api.icon_cache.get(icon)
+
+    async def start(self):
+        await self._send('POST', '')
+
+    async def stop(self):
+        await self._send('DELETE', '/run')
+
+    async def status(self):
+        return await self._send('GET', '')
+
+    async def _send(self, method, url):
+        sony_api = self._sony_api
+        ip = sony_api._ip_address
+        # DIAL is always on port 80
+        host = ip.split(':')[0]
+        headers = {
+            'Origin': 'package:com.google.android.youtube',
+            'Host':   ip
+        }
+        timeout = sony_api.timeouts.resolve('DIAL', method)
+
+        try:
+            response = await asyncio.wait_for(
+                sony_api.connection_pool.request(
+                    method,
+                    'http://%s:80/DIAL/apps/%s%s' % (host, self.title, url),
+                    headers=headers,
+                    operation=('dial', 'DIAL', method)
+                ),
+                timeout
+            )
+        except asyncio.TimeoutError:
+            _LOGGER.error('DIAL.' + method, err='DeadlineExceededError')
+            raise DeadlineExceededError(
+                'DIAL.%s did not respond within %s seconds' %
+                (method, timeout)
+            )
+        except _TRANSPORT_ERRORS:
+            _LOGGER.error(err='SendError', exc_info=True)
+            raise SendError(traceback.format_exc())
+        return response.content
+
+    async def active(self):
+        return await self._sony_api.send(
+            'appControl',
+            'setActiveApp',
+            uri=self.uri
+        )
+
+
+def _make_getter(name):
+    async def getter(self):
+        return await self.get(name)
+
+    getter.__name__ = 'get_' + name
+    return getter
+
+
+for _name in PROPERTIES:
+    setattr(AsyncSonyAPI, 'get_' + _name, _make_getter(_name))
+
+del _name
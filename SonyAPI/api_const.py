@@ -38,6 +38,17 @@ CHANNEL_EVENT = 0x4
 POWER_EVENT = 0x5
 MEDIA_EVENT = 0x6
 
+PROTOCOLS = (
+    'system',
+    'appControl',
+    'videoScreen',
+    'avContent',
+    'audio',
+    'cec',
+    'recording',
+    'browser'
+)
+
 SSDP_ADDR = "239.255.255.250"
 SSDP_PORT = 1900
 SSDP_MX = 1
@@ -20,7 +20,6 @@
 
 from __future__ import absolute_import
 from .utils import get_icon
-import requests
 
 
 class Application(object):
@@ -35,32 +34,49 @@ class Application(object):
             if icon in sony_api.icon_cache:
                 self.display_icon = sony_api.icon_cache[icon]
             elif sony_api._ip_address.split(':')[0] not in icon:
-                self.display_icon = get_icon(icon)
+                self.display_icon = get_icon(
+                    icon,
+                    sony_api.connection_pool,
+                    sony_api.timeouts.requests_timeout(
+                        sony_api.timeouts.resolve('icon', 'GET')
+                    )
+                )
                 sony_api.icon_cache[icon] = self.display_icon
 
         self.icon = icon
 
     def start(self):
-        self._send(requests.post, '')
+        self._send('POST', '')
 
     def stop(self):
-        self._send(requests.delete, '/run')
+        self._send('DELETE', '/run')
 
     def status(self):
-        return self._send(requests.get, '')
+        return self._send('GET', '')
 
-    def _send(self, func, url):
+    def _send(self, method, url):
         ip = self._sony_api._ip_address
+        # DIAL is always on port 80
+        host = ip.split(':')[0]
         headers = {
             'Origin': 'package:com.google.android.youtube',
             'Host':   ip
         }
 
-        response = func(
-            'http://' + ip + ':80/DIAL/apps/' + self.title + url,
-            **headers
+        response = self._sony_api.connection_pool.request(
+            method,
+            'http://%s:80/DIAL/apps/%s%s' % (host, self.title, url),
+            headers=headers,
+            timeout=self._sony_api.timeouts.requests_timeout(
+                self._sony_api.timeouts.resolve('DIAL', method)
+            ),
+            operation=('dial', 'DIAL', method)
         )
-        return response.read()
+        return response.content
 
     def active(self):
-        self._sony_api.send('appControl', 'setActiveApp', uri=self.uri)
+        return self._sony_api.send(
+            'appControl',
+            'setActiveApp',
+            uri=self.uri
+        )
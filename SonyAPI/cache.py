@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from __future__ import absolute_import
+
+import copy
+import json
+import time
+import threading
+
+# seconds a response is kept for. Only requests for information that
+# does not change while the TV is running are listed.
+DEFAULT_TTLS = dict(
+    getSystemInformation=3600.0,
+    getInterfaceInformation=3600.0,
+    getRemoteControllerInfo=3600.0,
+    getSystemSupportedFunction=3600.0,
+    getColorKeysLayout=3600.0,
+    getSupportedRepeatType=3600.0,
+    getSchemeList=3600.0,
+    getDateTimeFormat=300.0,
+    getNetworkSettings=300.0
+)
+
+
+def is_read_only(method):
+    return method.startswith('get')
+
+
+def request_key(protocol, method, params, return_index=0):
+    return (
+        protocol,
+        method,
+        return_index,
+        json.dumps(params, sort_keys=True)
+    )
+
+
+class ResponseCache(object):
+
+    def __init__(self, ttls=None, default_ttl=0.0):
+        self.default_ttl = default_ttl
+        self._ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self._ttls.update(ttls)
+
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        # bumped by invalidate, a read that started before an
+        # invalidation does not get to store what it read.
+        self._generation = 0
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def ttl(self, method):
+        if not is_read_only(method):
+            return 0.0
+        return self._ttls.get(method, self.default_ttl)
+
+    def set_ttl(self, method, ttl):
+        with self._lock:
+            self._ttls[method] = ttl
+            for key in list(self._entries.keys()):
+                if key[1] == method:
+                    del self._entries[key]
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.time():
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            self.hits += 1
+
+        return True, copy.deepcopy(entry[1])
+
+    def generation(self, protocol):
+        # take this before sending a get and pass it to put
+        with self._lock:
+            return self._generation, self._generations.get(protocol, 0)
+
+    def put(self, key, value, generation=None):
+        ttl = self.ttl(key[1])
+        if ttl > 0:
+            with self._lock:
+                if generation is not None and generation != (
+                    self._generation,
+                    self._generations.get(key[0], 0)
+                ):
+                    return
+                self._entries[key] = (time.time() + ttl, copy.deepcopy(value))
+
+    def invalidate(self, protocol=None, method=None):
+        with self._lock:
+            if protocol is None:
+                self._generation += 1
+            else:
+                self._generations[protocol] = (
+                    self._generations.get(protocol, 0) + 1
+                )
+
+            if protocol is None and method is None:
+                self._entries.clear()
+                return
+
+            for key in list(self._entries.keys()):
+                if (
+                    (protocol is None or key[0] == protocol) and
+                    (method is None or key[1] == method)
+                ):
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                entries=len(self._entries)
+            )
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from __future__ import absolute_import
+
+import os
+import json
+import threading
+from .logger import LOGGER as _LOGGER
+
+DEFAULT_PATH = os.path.join(
+    os.path.expanduser('~'),
+    '.SonyAPI',
+    'capabilities.json'
+)
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+def fingerprint(system_information, interface_information):
+    return '%s|%s|%s' % (
+        system_information.get('model', ''),
+        system_information.get('serial', ''),
+        interface_information.get('interfaceVersion', '')
+    )
+
+
+class CapabilityCache(object):
+
+    def __init__(self, path=None):
+        if path is None:
+            path = DEFAULT_PATH
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+        if not isinstance(data, dict):
+            return {}
+        return data
+
+    def load(self, key):
+        with self._lock:
+            entry = self._read().get(key)
+
+        if (
+            not isinstance(entry, dict) or
+            not isinstance(entry.get('methods'), dict) or
+            not isinstance(entry.get('remote_command_list'), dict)
+        ):
+            return None
+
+        _LOGGER.debug('||', capability_cache=self.path, loaded=key)
+        return entry
+
+    def save(self, key, methods, remote_command_list):
+        with self._lock:
+            data = self._read()
+            data[key] = dict(
+                methods=methods,
+                remote_command_list=remote_command_list
+            )
+
+            directory = os.path.dirname(self.path)
+            tmp_path = '%s.%d.tmp' % (self.path, os.getpid())
+            try:
+                if directory and not os.path.isdir(directory):
+                    os.makedirs(directory)
+
+                with open(tmp_path, 'w') as f:
+                    json.dump(data, f)
+                _replace(tmp_path, self.path)
+            except (IOError, OSError):
+                _LOGGER.error(err='CapabilityCacheError')
+                return False
+
+        _LOGGER.debug('||', capability_cache=self.path, saved=key)
+        return True
+
+    def remove(self, key=None):
+        with self._lock:
+            if key is None:
+                data = {}
+            else:
+                data = self._read()
+                data.pop(key, None)
+
+            try:
+                with open(self.path, 'w') as f:
+                    json.dump(data, f)
+            except (IOError, OSError):
+                _LOGGER.error(err='CapabilityCacheError')
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# JSON encoding and decoding of the requests and responses. The fastest
+# library that is installed is used, the codecs work with bytes so the
+# response body does not get copied into a str before it is parsed.
+
+from __future__ import absolute_import
+
+import sys
+import json
+
+
+class JSONCodec(object):
+    name = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj).encode('UTF-8')
+
+    if sys.version_info[:2] >= (3, 6) or sys.version_info[0] == 2:
+        def loads(self, data):
+            return json.loads(data)
+    else:
+        def loads(self, data):
+            return json.loads(data.decode('utf-8'))
+
+
+class OrjsonCodec(JSONCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.dumps = orjson.dumps
+        self.loads = orjson.loads
+
+
+class UjsonCodec(JSONCodec):
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+        self.loads = ujson.loads
+
+    def dumps(self, obj):
+        return self._ujson.dumps(obj).encode('UTF-8')
+
+
+CODECS = dict(
+    orjson=OrjsonCodec,
+    ujson=UjsonCodec,
+    json=JSONCodec
+)
+
+PREFERENCE = ('orjson', 'ujson', 'json')
+
+
+def get_codec(name=None):
+    if name is not None:
+        return CODECS[name]()
+
+    for name in PREFERENCE:
+        try:
+            return CODECS[name]()
+        except ImportError:
+            continue
+
+
+CODEC = get_codec()
+
+
+def set_codec(codec=None):
+    global CODEC
+
+    if codec is None or isinstance(codec, str):
+        codec = get_codec(codec)
+
+    CODEC = codec
+    return codec
+
+
+def dumps(obj):
+    return CODEC.dumps(obj)
+
+
+def loads(data):
+    return CODEC.loads(data)
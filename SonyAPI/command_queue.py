@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from __future__ import absolute_import
+
+import time
+import threading
+from .logger import LOGGER as _LOGGER
+from .exception import SonyAPIError, CommandError
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class CommandBatch(object):
+
+    def __init__(self, codes):
+        self.codes = codes
+        self.sent = 0
+        self.errors = []
+        self._event = threading.Event()
+
+    @property
+    def done(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+    def _finish(self):
+        self._event.set()
+
+    def _abort(self, codes):
+        # codes that were not sent because the queue was stopped
+        if codes:
+            err = CommandError(
+                'the command queue was stopped before %d code(s) were '
+                'sent' % len(codes)
+            )
+            self.errors += list((code, err) for code in codes)
+        self._finish()
+
+
+class CommandQueue(object):
+    # IRCC codes are sent from a background thread with at least
+    # min_interval seconds between them, the TV drops keys that are sent
+    # faster than it can handle them.
+
+    def __init__(self, send, min_interval=0.1, idle_timeout=5.0):
+        self.min_interval = min_interval
+        self.idle_timeout = idle_timeout
+        self._send = send
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._last_sent = 0.0
+
+    def put(self, *codes):
+        batch = CommandBatch(list(codes))
+
+        with self._lock:
+            self._queue.put(batch)
+            if self._thread is None:
+                self._stop_event = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._run,
+                    args=(self._stop_event, self._queue)
+                )
+                self._thread.daemon = True
+                self._thread.start()
+
+        return batch
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    def _run(self, stop_event, work):
+        # work is the queue this worker was started for, stop() gives
+        # the next worker a new one so a stopped worker never takes a
+        # batch that was put after stop().
+        try:
+            while True:
+                try:
+                    batch = work.get(timeout=self.idle_timeout)
+                except queue.Empty:
+                    with self._lock:
+                        if self._thread is not threading.current_thread():
+                            return
+                        if work.empty():
+                            self._thread = None
+                            return
+                    continue
+
+                if batch is None:
+                    # woken up by stop()
+                    return
+
+                self._send_batch(batch, stop_event)
+        finally:
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+
+    def _send_batch(self, batch, stop_event):
+        for index, code in enumerate(batch.codes):
+            if stop_event.is_set():
+                batch._abort(batch.codes[index:])
+                return
+
+            delay = self._last_sent + self.min_interval - time.time()
+            if delay > 0:
+                stop_event.wait(delay)
+                if stop_event.is_set():
+                    batch._abort(batch.codes[index:])
+                    return
+
+            try:
+                self._send(code)
+                batch.sent += 1
+            except SonyAPIError as err:
+                _LOGGER.error(code, err='IRCCError')
+                batch.errors += [(code, err)]
+            except Exception as err:
+                _LOGGER.error(code, err='IRCCError', exc_info=True)
+                batch.errors += [(code, err)]
+
+            self._last_sent = time.time()
+
+        batch._finish()
+
+    def stop(self, timeout=3.0):
+        # batches that have not been sent are finished with a
+        # CommandError for every code that did not go out.
+        with self._lock:
+            thread = self._thread
+            work = self._queue
+            self._thread = None
+            self._queue = queue.Queue()
+            self._stop_event.set()
+
+        work.put(None)
+
+        if thread is not None:
+            thread.join(timeout)
+
+        while True:
+            try:
+                batch = work.get_nowait()
+            except queue.Empty:
+                break
+            if batch is not None:
+                batch._abort(batch.codes)
@@ -0,0 +1,668 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+# A stand-in Bravia TV that runs locally. The JSON-RPC responses come
+# from test.TEST_SCHEMA so the whole client stack (HTTP, IRCC,
+# registration and event subscriptions) can be run without a TV.
+#
+#   python -m SonyAPI.emulator [--host 127.0.0.1] [--port 8080] [--psk 0000]
+#                              [--scenario scenario.json]
+#
+#   with Emulator(psk='0000') as tv:
+#       api = SonyAPI.SonyAPI(ip_address=tv.address, psk='0000')
+
+from __future__ import absolute_import, print_function
+
+import re
+import copy
+import json
+import time
+import uuid
+import base64
+import socket
+import struct
+import threading
+from .scenario import Scenario
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+
+try:
+    string_types = (str, unicode)
+except NameError:
+    string_types = (str,)
+
+VERSION_RE = re.compile(r'^\d+\.\d+$')
+IRCC_CODE_RE = re.compile(r'<IRCCCode>(.*?)</IRCCCode>')
+
+IRCC_RESPONSE = (
+    '<?xml version="1.0"?>'
+    '<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/" '
+    's:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/">'
+    '<s:Body>'
+    '<u:X_SendIRCCResponse xmlns:u="urn:schemas-sony-com:service:IRCC:1">'
+    '</u:X_SendIRCCResponse>'
+    '</s:Body>'
+    '</s:Envelope>'
+)
+
+IRCC_FAULT = (
+    '<?xml version="1.0"?>'
+    '<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/" '
+    's:encodingStyle="http://schemas.xmlsoap.org/soap/encoding/">'
+    '<s:Body>'
+    '<s:Fault>'
+    '<faultcode>s:Client</faultcode>'
+    '<faultstring>UPnPError</faultstring>'
+    '<detail>'
+    '<UPnPError xmlns="urn:schemas-upnp-org:control-1-0">'
+    '<errorCode>800</errorCode>'
+    '<errorDescription>Cannot accept the IRCC Code</errorDescription>'
+    '</UPnPError>'
+    '</detail>'
+    '</s:Fault>'
+    '</s:Body>'
+    '</s:Envelope>'
+)
+
+
+# 1x1 transparent PNG, padded to icon_size by the emulator
+ICON = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA'
+    '60e6kgAAAABJRU5ErkJggg=='
+)
+
+
+def method_versions(methods):
+    # {version: [method, ...]} the version of a method is the one in
+    # its params, methods that take arguments are 1.0.
+    versions = {}
+    for method, spec in methods.items():
+        if method == 'getVersions':
+            continue
+
+        version = '1.0'
+        params = spec.get('params') or []
+        if (
+            params and
+            isinstance(params[0], string_types) and
+            VERSION_RE.match(params[0])
+        ):
+            version = params[0]
+
+        versions.setdefault(version, []).append(method)
+    return versions
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, emulator):
+        self.emulator = emulator
+        HTTPServer.__init__(self, address, _Handler)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'SonyAPIEmulator/1.0'
+    # headers and body are separate writes, without this every reply
+    # waits for the client's delayed ACK.
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def finish(self):
+        try:
+            BaseHTTPRequestHandler.finish(self)
+        except (socket.error, ValueError):
+            # the connection was reset on purpose
+            pass
+
+    def _reset(self):
+        self.close_connection = True
+        try:
+            self.connection.setsockopt(
+                socket.SOL_SOCKET,
+                socket.SO_LINGER,
+                struct.pack('ii', 1, 0)
+            )
+            self.connection.close()
+        except socket.error:
+            pass
+
+    def _inject(self, protocol, method, body=None):
+        # applies the scenario, returns True when the request has been
+        # dealt with by a fault.
+        scenario = self.server.emulator.scenario
+        if scenario is None:
+            return False
+
+        delay, fault = scenario.plan(protocol, method)
+        if delay:
+            time.sleep(delay)
+
+        if fault is None:
+            return False
+
+        if fault.type == 'reset':
+            self._reset()
+
+        elif fault.type == 'timeout':
+            time.sleep(fault.duration)
+            self.close_connection = True
+
+        elif fault.type == 'error':
+            if protocol == 'IRCC':
+                self._reply(500, IRCC_FAULT, {'Content-Type': 'text/xml'})
+            elif protocol == 'upnp':
+                self._reply(500)
+            else:
+                try:
+                    request_id = json.loads(body.decode('utf-8'))['id']
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    request_id = None
+
+                self._reply(
+                    200,
+                    json.dumps(dict(
+                        error=[fault.code, fault.error_message(method)],
+                        id=request_id
+                    )),
+                    {'Content-Type': 'application/json'}
+                )
+        else:
+            self._reply(fault.status)
+
+        return True
+
+    @staticmethod
+    def _rpc_method(body):
+        try:
+            return json.loads(body.decode('utf-8'))['method']
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            return self.rfile.read(length)
+        return b''
+
+    def _reply(self, status, body=b'', headers=None):
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        emulator = self.server.emulator
+        path = self.path.split('?', 1)[0].rstrip('/')
+        body = self._body()
+
+        if path == '/sony/IRCC':
+            if self._inject('IRCC', 'X_SendIRCC', body):
+                return
+            status, content = emulator.handle_ircc(body, self.headers)
+            self._reply(status, content, {'Content-Type': 'text/xml'})
+
+        elif path == '/sony/accessControl':
+            if self._inject('accessControl', 'actRegister', body):
+                return
+            status, content, headers = emulator.handle_register(
+                body,
+                self.headers
+            )
+            headers['Content-Type'] = 'application/json'
+            self._reply(status, json.dumps(content), headers)
+
+        elif path.startswith('/sony/'):
+            protocol = path[len('/sony/'):]
+            if (
+                emulator.scenario is not None and
+                self._inject(protocol, self._rpc_method(body), body)
+            ):
+                return
+            status, content = emulator.handle_rpc(
+                protocol,
+                body,
+                self.headers
+            )
+            if content is None:
+                self._reply(status)
+            else:
+                self._reply(
+                    status,
+                    json.dumps(content),
+                    {'Content-Type': 'application/json'}
+                )
+        else:
+            self._reply(404)
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+
+        if path.startswith('/icons/'):
+            if self._inject('icon', 'GET'):
+                return
+            self._reply(
+                200,
+                self.server.emulator.icon,
+                {'Content-Type': 'image/png'}
+            )
+        else:
+            self._reply(404)
+
+    def do_SUBSCRIBE(self):
+        self._body()
+        if self._inject('upnp', 'SUBSCRIBE'):
+            return
+        status, headers = self.server.emulator.handle_subscribe(
+            self.path,
+            self.headers
+        )
+        self._reply(status, b'', headers)
+
+    def do_UNSUBSCRIBE(self):
+        self._body()
+        if self._inject('upnp', 'UNSUBSCRIBE'):
+            return
+        status = self.server.emulator.handle_unsubscribe(
+            self.path,
+            self.headers
+        )
+        self._reply(status)
+
+
+class Emulator(object):
+    # psk and pin turn on authentication. With a psk set requests need
+    # the X-Auth-PSK header, with a pin set the client has to register
+    # through /sony/accessControl and send the auth cookie it gets back.
+    # scenario adds latency and faults, see scenario.py.
+
+    def __init__(
+        self,
+        schema=None,
+        host='127.0.0.1',
+        port=0,
+        upnp_port=52323,
+        psk=None,
+        pin=None,
+        scenario=None,
+        icon_size=4096
+    ):
+        if schema is None:
+            from .test import TEST_SCHEMA as schema
+
+        self.schema = copy.deepcopy(schema)
+        self.host = host
+        self.port = port
+        self.upnp_port = upnp_port
+        self.psk = psk
+        self.pin = pin
+        self.scenario = Scenario.load(scenario)
+        self.icon = ICON + b'\0' * max(0, icon_size - len(ICON))
+
+        self.calls = {}
+        self.ircc_codes = []
+        self.subscriptions = {}
+        self.handlers = {
+            ('avContent', 'getContentList'): self._get_content_list,
+            ('avContent', 'getSourceList'): self._get_source_list,
+            ('system', 'getPowerStatus'): self._get_power_status,
+            ('system', 'setPowerStatus'): self._set_power_status
+        }
+
+        self._versions = dict(
+            (protocol, method_versions(methods))
+            for protocol, methods in self.schema.items()
+        )
+        self._content = {}
+        self._power = True
+        self._tokens = set()
+        self._lock = threading.Lock()
+        self._servers = []
+        self._threads = []
+
+    @property
+    def address(self):
+        # what is passed to SonyAPI as the ip_address
+        return '%s:%d' % (self.host, self.port)
+
+    def start(self):
+        server = _Server((self.host, self.port), self)
+        self.port = server.server_address[1]
+        self._servers += [server]
+
+        if self.upnp_port is not None:
+            upnp_server = _Server((self.host, self.upnp_port), self)
+            self.upnp_port = upnp_server.server_address[1]
+            self._servers += [upnp_server]
+
+        for server in self._servers:
+            thread = threading.Thread(target=server.serve_forever)
+            thread.daemon = True
+            thread.start()
+            self._threads += [thread]
+        return self
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+
+        for thread in self._threads:
+            thread.join(3.0)
+
+        del self._servers[:]
+        del self._threads[:]
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *_):
+        self.stop()
+
+    @property
+    def command_list(self):
+        return dict(
+            (command['name'], command['value'])
+            for command in (
+                self.schema['system']['getRemoteControllerInfo']['result'][1]
+            )
+        )
+
+    def set_content(self, source, items=None, count=None):
+        # count generates that many channels from the first item of
+        # the getContentList fixture.
+        if items is None:
+            template = (
+                self.schema['avContent']['getContentList']['result'][0][0]
+            )
+            items = []
+            for i in range(count or 0):
+                item = dict(template)
+                item['index'] = i
+                item['dispNum'] = '%03d' % (i + 1)
+                item['title'] = 'Channel %d' % (i + 1)
+                item['uri'] = '%s?trip=%d.1.%d' % (source, i, i)
+                items += [item]
+
+        with self._lock:
+            self._content[source] = items
+
+    def set_applications(self, count, icon_host='localhost'):
+        # count applications with icons served by the emulator. The
+        # client does not fetch icons from the address of the TV so
+        # they use icon_host.
+        applications = []
+        for i in range(count):
+            applications += [dict(
+                title='Application %d' % i,
+                uri='com.sony.dtv.app%d' % i,
+                icon='http://%s:%d/icons/%d.png' % (icon_host, self.port, i)
+            )]
+
+        self.schema['appControl']['getApplicationList']['result'] = [
+            applications
+        ]
+
+    def _count(self, protocol, method):
+        key = (protocol, method)
+        with self._lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+    def _authorized(self, headers):
+        if self.psk is None and self.pin is None:
+            return True
+
+        if self.psk is not None and headers.get('X-Auth-PSK') == self.psk:
+            return True
+
+        cookie = headers.get('Cookie') or ''
+        for part in cookie.split(';'):
+            key, _, value = part.strip().partition('=')
+            if key == 'auth' and value in self._tokens:
+                return True
+        return False
+
+    def handle_rpc(self, protocol, body, headers):
+        methods = self.schema.get(protocol)
+        if methods is None:
+            return 404, None
+
+        try:
+            request = json.loads(body.decode('utf-8'))
+            method = request['method']
+            params = request.get('params') or []
+            request_id = request.get('id', 1)
+        except (ValueError, KeyError, AttributeError):
+            return 200, dict(error=[3, 'Illegal Argument'], id=None)
+
+        self._count(protocol, method)
+        versions = self._versions[protocol]
+
+        if method == 'getVersions':
+            return 200, dict(result=[sorted(versions.keys())], id=request_id)
+
+        if method == 'getMethodTypes':
+            version = params[0] if params else ''
+            return 200, dict(
+                results=list(
+                    [name, [], [], version]
+                    for name in sorted(versions.get(version, []))
+                ),
+                id=request_id
+            )
+
+        # getVersions and getMethodTypes do not need authentication
+        if not self._authorized(headers):
+            return 401, None
+
+        if method not in methods:
+            return 200, dict(error=[12, method], id=request_id)
+
+        handler = self.handlers.get((protocol, method))
+        if handler is None:
+            result = copy.deepcopy(methods[method]['result'])
+        else:
+            result = handler(params)
+
+        return 200, dict(result=result, id=request_id)
+
+    def _get_content_list(self, params):
+        params = params[0] if params and isinstance(params[0], dict) else {}
+        source = params.get('source', '')
+
+        with self._lock:
+            items = self._content.get(source)
+
+        if items is None:
+            return copy.deepcopy(
+                self.schema['avContent']['getContentList']['result']
+            )
+
+        start = int(params.get('stIdx') or 0)
+        count = params.get('cnt')
+        if count:
+            items = items[start:start + int(count)]
+        elif start:
+            items = items[start:]
+        return [copy.deepcopy(items)]
+
+    def _get_source_list(self, params):
+        params = params[0] if params and isinstance(params[0], dict) else {}
+        scheme = params.get('scheme', '')
+        sources = self.schema['avContent']['getSourceList']['result'][0]
+
+        return [list(
+            dict(source)
+            for source in sources
+            if not scheme or source['source'].startswith(scheme + ':')
+        )]
+
+    def _get_power_status(self, _):
+        return [dict(status='active' if self._power else 'standby')]
+
+    def _set_power_status(self, params):
+        if params and isinstance(params[0], dict):
+            # the client sends status='true', a real TV also takes a bool
+            status = params[0].get('status')
+            if isinstance(status, string_types):
+                status = status.strip().lower() == 'true'
+            self._power = bool(status)
+        return []
+
+    def handle_ircc(self, body, headers):
+        self._count('IRCC', 'X_SendIRCC')
+
+        if not self._authorized(headers):
+            return 401, b''
+
+        match = IRCC_CODE_RE.search(body.decode('utf-8', 'replace'))
+        code = match.group(1).strip() if match else None
+
+        if code not in self.command_list.values():
+            return 500, IRCC_FAULT
+
+        with self._lock:
+            self.ircc_codes += [code]
+        return 200, IRCC_RESPONSE
+
+    def handle_register(self, body, headers):
+        self._count('accessControl', 'actRegister')
+
+        try:
+            request = json.loads(body.decode('utf-8'))
+            request_id = request.get('id', 1)
+        except (ValueError, AttributeError):
+            return 200, dict(error=[3, 'Illegal Argument'], id=None), {}
+
+        if self.pin is not None:
+            authorization = headers.get('Authorization') or ''
+            if not authorization.startswith('Basic '):
+                # the TV shows the pin and waits for it to be sent back
+                return 401, dict(error=[401, 'Unauthorized']), {}
+
+            try:
+                credentials = base64.b64decode(
+                    authorization[len('Basic '):].strip()
+                ).decode('utf-8')
+            except (TypeError, ValueError):
+                credentials = ''
+
+            if credentials.partition(':')[2] != str(self.pin):
+                return 401, dict(error=[401, 'Unauthorized']), {}
+
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._tokens.add(token)
+
+        return (
+            200,
+            dict(result=[], id=request_id),
+            {'Set-Cookie': 'auth=%s; Path=/sony/; Max-Age=1209600' % token}
+        )
+
+    def handle_subscribe(self, path, headers):
+        if not path.startswith('/upnp/event/'):
+            return 404, {}
+
+        service = path[len('/upnp/event/'):]
+        self._count('upnp', 'SUBSCRIBE')
+
+        sid = headers.get('SID')
+        with self._lock:
+            if sid:
+                # renewal
+                if sid not in self.subscriptions:
+                    return 412, {}
+            else:
+                if not headers.get('CALLBACK') or (
+                    headers.get('NT') != 'upnp:event'
+                ):
+                    return 412, {}
+
+                sid = 'uuid:' + str(uuid.uuid4())
+                self.subscriptions[sid] = dict(
+                    service=service,
+                    callback=headers.get('CALLBACK')
+                )
+
+        return 200, {
+            'SID': sid,
+            'TIMEOUT': headers.get('TIMEOUT') or 'Second-1800'
+        }
+
+    def handle_unsubscribe(self, path, headers):
+        self._count('upnp', 'UNSUBSCRIBE')
+
+        with self._lock:
+            if self.subscriptions.pop(headers.get('SID'), None) is None:
+                return 412
+        return 200
+
+
+def main(args=None):
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Emulated Bravia TV')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--upnp-port', type=int, default=52323)
+    parser.add_argument('--psk', default=None)
+    parser.add_argument('--pin', default=None)
+    parser.add_argument('--scenario', default=None)
+    args = parser.parse_args(args)
+
+    emulator = Emulator(
+        host=args.host,
+        port=args.port,
+        upnp_port=args.upnp_port,
+        psk=args.psk,
+        pin=args.pin,
+        scenario=args.scenario
+    )
+    emulator.start()
+    print('Emulated TV running on', emulator.address)
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.stop()
+
+
+if __name__ == '__main__':
+    main()
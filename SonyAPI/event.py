@@ -19,9 +19,9 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 
-import requests
 import socket
 import threading
+from .session import SessionPool
 # from api_const import (
 #     VOLUME_EVENT,
 #     MUTE_EVENT,
@@ -36,11 +36,18 @@ class Base(object):
     service = ''
     local_port = None
 
-    def __init__(self, ip):
+    def __init__(self, ip, session=None, timeout=None):
+        if session is None:
+            session = SessionPool()
+        self._session = session
+        self._timeout = timeout
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.connect(('8.8.8.8', 0))
         self.local_ip_address = s.getsockname()[0]
-        self.url = 'http://%s:52323/upnp/event/%s' % (ip, self.service)
+        self.url = 'http://%s:52323/upnp/event/%s' % (
+            ip.split(':')[0],
+            self.service
+        )
         self.header = dict(
             NT='upnp:event',
             CALLBACK=(
@@ -83,22 +90,32 @@ class Base(object):
                     SID=self.sid,
                     TIMEOUT='Second-1800'
                 )
-                requests.request(
+                self._session.request(
                     'SUBSCRIBE',
                     self.url,
-                    headers=header
+                    headers=header,
+                    timeout=self._timeout,
+                    operation=('subscribe', 'upnp', 'SUBSCRIBE')
                 )
 
         header = dict(
             SID=self.sid
         )
-        requests.request('UNSUBSCRIBE', self.url, headers=header)
+        self._session.request(
+            'UNSUBSCRIBE',
+            self.url,
+            headers=header,
+            timeout=self._timeout,
+            operation=('subscribe', 'upnp', 'UNSUBSCRIBE')
+        )
 
     def start(self):
-        response = requests.request(
+        response = self._session.request(
             'SUBSCRIBE',
             self.url,
-            headers=self.header
+            headers=self.header,
+            timeout=self._timeout,
+            operation=('subscribe', 'upnp', 'SUBSCRIBE')
         )
         self.sid = response.headers['SID']
         self._listen_thread.start()
@@ -27,15 +27,31 @@ class SonyAPIError(Exception):
     __module__ = 'SonyAPI'
 
     def __init__(self, msg):
+        # the message is only formatted when it is used.
+        self._msg = msg
+        _LOGGER.error(msg, err=self.__class__.__name__)
+
+    @property
+    def msg(self):
+        msg = self._msg
         if isinstance(msg, dict):
             msg = json.dumps(msg, indent=4)
-
-        _LOGGER.error(self.__class__.__name__, msg)
-        self.msg = msg
+        return msg
 
     def __str__(self):
         return self.msg
 
+    def __reduce__(self):
+        # unpickling does not call __init__, that would log the error a
+        # second time in the process it is sent to.
+        return _restore, (self.__class__, self.args, self.__dict__)
+
+
+def _restore(cls, args, state):
+    err = cls.__new__(cls, *args)
+    err.__dict__.update(state)
+    return err
+
 
 class PinError(SonyAPIError):
     __module__ = 'SonyAPI'
@@ -92,5 +108,15 @@ class SendError(SonyAPIError):
     __module__ = 'SonyAPI'
 
 
+class DeadlineExceededError(SendError):
+    __module__ = 'SonyAPI'
+
+
+class CircuitOpenError(SendError):
+    # the TV has stopped responding, requests are not sent until the
+    # circuit breaker lets a probe through.
+    __module__ = 'SonyAPI'
+
+
 class IPAddressError(SonyAPIError):
     __module__ = 'SonyAPI'
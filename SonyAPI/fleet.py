@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Runs the same operation on many TVs. All of the devices share one
+# bounded thread pool, each device has a limit on how many of its
+# operations run at the same time. Operations over that limit wait in
+# the device's own queue and not in a worker thread, so a slow TV only
+# holds up itself.
+
+from __future__ import absolute_import
+
+import types
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .logger import LOGGER as _LOGGER
+from .metrics import clock as _clock
+from .exception import SonyAPIError, DeadlineExceededError
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+
+def run_operation(client, operation):
+    # operations are tuples so they can be sent to a worker process
+    kind = operation[0]
+
+    if kind == 'get':
+        return getattr(client, operation[1])
+    if kind == 'set':
+        setattr(client, operation[1], operation[2])
+        return None
+    if kind == 'send':
+        return client.send(operation[1], operation[2], **operation[3])
+    if kind == 'send_command':
+        return client.send_command(operation[1])
+    if kind == 'ircc':
+        return client.ircc(operation[1])
+    return operation[1](client)
+
+
+class Result(object):
+    __slots__ = ('name', 'value', 'error', 'duration')
+
+    def __init__(self, name, value=None, error=None, duration=0.0):
+        self.name = name
+        self.value = value
+        self.error = error
+        self.duration = duration
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if self.error is None:
+            return '<Result %s %r>' % (self.name, self.value)
+        return '<Result %s %s: %s>' % (
+            self.name,
+            self.error.__class__.__name__,
+            self.error
+        )
+
+
+class Batch(object):
+    # The results of one fleet operation. Iterating yields the results
+    # in the order they complete.
+
+    def __init__(self, names):
+        self.names = names
+        self.results = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._yielded = 0
+
+    def _put(self, result):
+        with self._lock:
+            if result.name in self.results:
+                # it already timed out
+                return
+            self.results[result.name] = result
+        self._queue.put(result)
+
+    @property
+    def done(self):
+        return len(self.results) == len(self.names)
+
+    def as_completed(self, timeout=None):
+        # devices that have not answered after timeout seconds get a
+        # DeadlineExceededError result, anything they return after that
+        # is dropped.
+        expires = None if timeout is None else _clock() + timeout
+
+        while self._yielded < len(self.names):
+            try:
+                if expires is None:
+                    result = self._queue.get()
+                else:
+                    result = self._queue.get(
+                        timeout=max(0.0, expires - _clock())
+                    )
+            except queue.Empty:
+                for result in self._expire(timeout):
+                    self._yielded += 1
+                    yield result
+                return
+
+            self._yielded += 1
+            yield result
+
+    def _expire(self, timeout):
+        expired = []
+        with self._lock:
+            for name in self.names:
+                if name not in self.results:
+                    result = Result(
+                        name,
+                        error=DeadlineExceededError(
+                            '%s did not answer within %.3f seconds' %
+                            (name, timeout)
+                        ),
+                        duration=timeout
+                    )
+                    self.results[name] = result
+                    expired += [result]
+
+        # results that got in before the lock was taken
+        while True:
+            try:
+                expired.insert(0, self._queue.get_nowait())
+            except queue.Empty:
+                return expired
+
+    def __iter__(self):
+        return self.as_completed()
+
+    def wait(self, timeout=None):
+        for _ in self.as_completed(timeout):
+            pass
+        return self.results
+
+    @property
+    def errors(self):
+        return dict(
+            (name, result.error)
+            for name, result in self.results.items()
+            if result.error is not None
+        )
+
+
+class _Device(object):
+
+    def __init__(self, name, client, address, limit):
+        self.name = name
+        self.client = client
+        self.address = address
+        self.limit = limit
+        self.active = 0
+        self.pending = deque()
+        self.lock = threading.Lock()
+        self.create_lock = threading.Lock()
+
+    def get_client(self, factory):
+        # clients that are given as an address are created on first use
+        # in a worker thread, connecting to a TV takes a few requests.
+        if self.client is None:
+            with self.create_lock:
+                if self.client is None:
+                    self.client = factory(self.address)
+        return self.client
+
+
+class Fleet(object):
+    # devices maps a name to a SonyAPI instance or to the ip address
+    # of the TV, or is a list of addresses. Clients for addresses are
+    # made with factory(address), which is
+    # SonyAPI(ip_address=address, **client_options) by default.
+    #
+    # processes spreads the devices over that many worker processes,
+    # each one with its own thread pool of workers threads and its own
+    # clients. Results come back as plain data, see shard.py.
+
+    def __init__(
+        self,
+        devices=None,
+        workers=32,
+        per_device=1,
+        factory=None,
+        processes=0,
+        **client_options
+    ):
+        self.per_device = max(1, per_device)
+        self._client_options = client_options
+        self._factory = factory or self._make_client
+        self._devices = {}
+        self._lock = threading.Lock()
+
+        if processes:
+            from .shard import ShardPool
+
+            self._executor = None
+            self._shards = ShardPool(
+                processes,
+                workers,
+                self.per_device,
+                factory,
+                client_options
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=workers)
+            self._shards = None
+
+        if isinstance(devices, dict):
+            devices = devices.items()
+        for device in devices or ():
+            if isinstance(device, string_types):
+                self.add(device)
+            else:
+                self.add(*device)
+
+    def _make_client(self, address):
+        from . import SonyAPI
+        return SonyAPI(ip_address=address, **self._client_options)
+
+    def add(self, name, device=None, per_device=None):
+        if device is None:
+            device = name
+
+        if isinstance(device, string_types):
+            device = _Device(name, None, device, per_device or self.per_device)
+        elif self._shards is not None:
+            raise TypeError(
+                'clients cannot be shared with worker processes, '
+                'pass the address of the TV'
+            )
+        else:
+            device = _Device(name, device, None, per_device or self.per_device)
+
+        with self._lock:
+            self._devices[name] = device
+
+        if self._shards is not None:
+            self._shards.add(name, device.address, device.limit)
+
+    def remove(self, name):
+        with self._lock:
+            device = self._devices.pop(name)
+
+        if self._shards is not None:
+            self._shards.remove(name)
+        return device.client
+
+    @property
+    def names(self):
+        return list(self._devices.keys())
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __contains__(self, name):
+        return name in self._devices
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __getitem__(self, name):
+        if self._shards is not None:
+            raise TypeError('the clients are in the worker processes')
+        return self._devices[name].get_client(self._factory)
+
+    def _select(self, names):
+        if names is None:
+            return list(self._devices.values())
+        if isinstance(names, string_types):
+            names = [names]
+        return list(self._devices[name] for name in names)
+
+    def call(self, func, names=None):
+        # runs func(client) on every device in names, all of them when
+        # names is None, and returns a Batch right away. With processes
+        # func has to be picklable.
+        return self._dispatch(('call', func), names)
+
+    def _dispatch(self, operation, names=None, batch=None):
+        devices = self._select(names)
+        if batch is None:
+            batch = Batch(list(device.name for device in devices))
+
+        if self._shards is not None:
+            self._shards.run(operation, batch)
+            return batch
+
+        for device in devices:
+            self._submit(device, (operation, batch))
+
+        return batch
+
+    def _submit(self, device, job):
+        with device.lock:
+            if device.active >= device.limit:
+                device.pending.append(job)
+                return
+            device.active += 1
+
+        self._executor.submit(self._run, device, job)
+
+    def _run(self, device, job):
+        while job is not None:
+            operation, batch = job
+            start = _clock()
+            try:
+                value = run_operation(
+                    device.get_client(self._factory),
+                    operation
+                )
+                if isinstance(value, types.GeneratorType):
+                    value = list(value)
+                result = Result(device.name, value, None, _clock() - start)
+            except Exception as err:
+                if not isinstance(err, SonyAPIError):
+                    # SonyAPIError logs itself
+                    _LOGGER.error(
+                        device.name,
+                        err=err.__class__.__name__,
+                        exc_info=True
+                    )
+                result = Result(device.name, None, err, _clock() - start)
+
+            batch._put(result)
+
+            with device.lock:
+                if device.pending:
+                    job = device.pending.popleft()
+                else:
+                    job = None
+                    device.active -= 1
+
+    def get(self, attribute, names=None):
+        return self._dispatch(('get', attribute), names)
+
+    def set(self, attribute, value, names=None):
+        return self._dispatch(('set', attribute, value), names)
+
+    def send(self, protocol, method, names=None, **params):
+        return self._dispatch(('send', protocol, method, params), names)
+
+    def send_command(self, command_name, names=None):
+        return self._dispatch(('send_command', command_name), names)
+
+    def ircc(self, code, names=None):
+        return self._dispatch(('ircc', code), names)
+
+    def close(self, wait=True):
+        if self._shards is not None:
+            self._shards.close()
+            return
+
+        self._executor.shutdown(wait)
+
+        with self._lock:
+            devices = list(self._devices.values())
+
+        for device in devices:
+            client = device.client
+            if client is not None:
+                client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __repr__(self):
+        return '<%s %d devices>' % (self.__class__.__name__, len(self))
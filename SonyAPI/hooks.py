@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+# Start and end callbacks around every HTTP round trip to the TV. The
+# connection pools call these, so JSON requests, IRCC commands,
+# discovery probes, registration, DIAL, icons and event subscriptions
+# are all covered.
+
+from __future__ import absolute_import
+
+import threading
+from .logger import LOGGER as _LOGGER
+from .metrics import clock
+
+
+class Hooks(object):
+    # The same payload dict is passed to on_start and on_end of a hook,
+    # a tracer can keep its span in the dict between the two calls.
+    #
+    #     kind            send, ircc, probe, register, dial, icon,
+    #                     subscribe or http
+    #     protocol        JSON-RPC protocol, IRCC, DIAL, upnp or None
+    #     method          JSON-RPC method, X_SendIRCC or the HTTP method
+    #     http_method     GET, POST, SUBSCRIBE, ...
+    #     url
+    #     request_bytes
+    #     start           clock() when the request started
+    #
+    # and once the request is done
+    #
+    #     response_bytes
+    #     status          HTTP status code, None when there was no response
+    #     duration        seconds
+    #     outcome         'ok' or 'error'
+    #     error           the exception or None
+
+    def __init__(self):
+        # replaced rather than changed so the request path can read it
+        # without a lock.
+        self._hooks = ()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._hooks)
+
+    def add(self, on_start=None, on_end=None):
+        hook = (on_start, on_end)
+        with self._lock:
+            self._hooks += (hook,)
+        return hook
+
+    def remove(self, hook):
+        with self._lock:
+            self._hooks = tuple(h for h in self._hooks if h is not hook)
+
+    def clear(self):
+        with self._lock:
+            self._hooks = ()
+
+    def start(self, http_method, url, operation=None, data=None):
+        if operation is None:
+            operation = ('http', None, http_method)
+
+        hooks = self._hooks
+        payload = dict(
+            kind=operation[0],
+            protocol=operation[1],
+            method=operation[2],
+            http_method=http_method,
+            url=url,
+            request_bytes=len(data) if data else 0,
+            start=clock(),
+            hooks=hooks
+        )
+
+        for on_start, _ in hooks:
+            if on_start is not None:
+                self._call(on_start, payload)
+        return payload
+
+    def end(self, payload, response=None, error=None):
+        payload['duration'] = clock() - payload['start']
+
+        if response is None:
+            payload['status'] = None
+            payload['response_bytes'] = 0
+        else:
+            payload['status'] = getattr(response, 'status_code', None)
+            payload['response_bytes'] = len(response.content or b'')
+
+        if error is None:
+            payload['outcome'] = 'ok'
+        else:
+            payload['outcome'] = 'error'
+        payload['error'] = error
+
+        # the hooks that saw the start get the end, even when hooks are
+        # added or removed while the request is running.
+        for _, on_end in payload.pop('hooks'):
+            if on_end is not None:
+                self._call(on_end, payload)
+
+    @staticmethod
+    def _call(func, payload):
+        try:
+            func(payload)
+        except Exception:
+            _LOGGER.error(err='HookError', exc_info=True)
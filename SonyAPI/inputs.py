@@ -23,11 +23,12 @@ from . import media
 
 
 class InputItem(object):
-    def __init__(self,  sony_api, source):
+    def __init__(self,  sony_api, source, status=None):
         self._sony_api = sony_api
         self._source = source
 
-        status = self._status
+        if status is None:
+            status = self._status
 
         if not status['label']:
             self.label = status['title']
@@ -39,7 +40,11 @@ class InputItem(object):
         self.icon = status['icon']
 
     def set(self):
-        self._sony_api.send('avContent', 'setPlayContent', uri=self.uri)
+        return self._sony_api.send(
+            'avContent',
+            'setPlayContent',
+            uri=self.uri
+        )
 
     @property
     def content(self):
@@ -18,57 +18,417 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
-import traceback
+
+# Debug and error logging. Nothing is formatted unless the record passes
+# the level, category and sampling checks, the arguments are kept as
+# they were passed and only turned into text when the record is written.
+
+import sys
+import time
 import json
+import atexit
+import threading
+import traceback
+from collections import deque
+
+DEBUG = 10
+ERROR = 40
 
+REQUEST = 'request'
+RESPONSE = 'response'
+STATE = 'state'
+GENERAL = 'general'
+ERRORS = 'error'
 
-def convert(d):
+CATEGORIES = (REQUEST, RESPONSE, STATE, GENERAL, ERRORS)
+
+# the first argument to debug is the direction of the data.
+DIRECTIONS = {
+    '<<': REQUEST,
+    '>>': RESPONSE,
+    '||': STATE
+}
+
+
+def convert(d, indent=None):
     if isinstance(d, dict):
         try:
-            d = json.dumps(d, indent=4)
+            d = json.dumps(d, indent=indent)
         except TypeError:
             pass
     return str(d)
 
 
 def debug_data(*args, **kwargs):
+    indent = kwargs.pop('_indent', None)
     data = []
     for arg in args:
-        data += [convert(arg)]
+        data += [convert(arg, indent)]
 
     for key, value in kwargs.items():
-        data += [key + ': ' + convert(value)]
+        data += [key + ': ' + convert(value, indent)]
     return '\n'.join(data)
 
 
-class LOGGER(object):
-    file_writer = None
-    name = __name__.rsplit('.', 1)[0]
+class Record(object):
+    __slots__ = (
+        'name',
+        'level',
+        'category',
+        'label',
+        'args',
+        'kwargs',
+        'exc_info',
+        'created',
+        'indent',
+        '_text'
+    )
 
-    @classmethod
-    def error(cls, *args, **kwargs):
+    def __init__(
+        self,
+        name,
+        level,
+        category,
+        label,
+        args,
+        kwargs,
+        exc_info=None,
+        indent=None
+    ):
+        self.name = name
+        self.level = level
+        self.category = category
+        self.label = label
+        self.args = args
+        self.kwargs = kwargs
+        self.exc_info = exc_info
+        self.created = time.time()
+        self.indent = indent
+        self._text = None
 
-        if 'err' in kwargs:
-            err = kwargs.pop('err')
-        else:
-            err = traceback.format_exc()
+    def format(self):
+        if self._text is None:
+            args = self.args
+            if self.exc_info is not None:
+                args += (
+                    ''.join(traceback.format_exception(*self.exc_info)),
+                )
+                # do not keep the frames alive once formatted
+                self.exc_info = None
 
-        if cls.file_writer:
+            kwargs = dict(self.kwargs)
+            kwargs['_indent'] = self.indent
             data = debug_data(*args, **kwargs)
-            data = data.replace('\n', '\n' + (' ' * (7 + len(err))))
 
-            cls.file_writer(
-                '%s.%s: %s\n' % (cls.name, err, data)
+            if self.level >= ERROR:
+                data = data.replace('\n', '\n' + (' ' * (7 + len(self.label))))
+                self._text = '%s.%s: %s\n' % (self.name, self.label, data)
+            else:
+                data = data.replace('\n', '\n' + (' ' * 19))
+                self._text = '%s: DEBUG: %s  %s\n' % (
+                    self.name,
+                    self.label,
+                    data
+                )
+
+            # nor the data that was logged
+            self.args = ()
+            self.kwargs = {}
+        return self._text
+
+    def __str__(self):
+        return self.format()
+
+
+class Logger(object):
+
+    def __init__(self, name, level=DEBUG, indent=None):
+        self.name = name
+        self.indent = indent
+        self._level = level
+        self._file_writer = None
+        self._sinks = ()
+        self._categories = dict((category, True) for category in CATEGORIES)
+        self._sampling = {}
+        self._counters = {}
+        self._debug = False
+        self._error = False
+
+    def _update(self):
+        # the flags are worked out once so debug and error only have to
+        # check a single attribute when logging is off.
+        enabled = self._file_writer is not None or bool(self._sinks)
+        self._debug = enabled and self._level <= DEBUG
+        self._error = (
+            enabled and
+            self._level <= ERROR and
+            self._categories[ERRORS]
+        )
+
+    @property
+    def file_writer(self):
+        return self._file_writer
+
+    @file_writer.setter
+    def file_writer(self, writer):
+        self._file_writer = writer
+        self._update()
+
+    @property
+    def sinks(self):
+        return self._sinks
+
+    def add_sink(self, sink):
+        self._sinks += (sink,)
+        self._update()
+        return sink
+
+    def remove_sink(self, sink):
+        self._sinks = tuple(s for s in self._sinks if s is not sink)
+        self._update()
+
+    @property
+    def level(self):
+        return self._level
+
+    @level.setter
+    def level(self, level):
+        self._level = level
+        self._update()
+
+    def enable(self, category, enabled=True):
+        if category not in self._categories:
+            raise KeyError(category)
+        self._categories[category] = enabled
+        self._update()
+
+    def is_enabled(self, category):
+        if category == ERRORS:
+            return self._error
+        return self._debug and self._categories[category]
+
+    def sample(self, category, every=1):
+        # only write 1 of every n records of a category
+        if every <= 1:
+            self._sampling.pop(category, None)
+        else:
+            self._sampling[category] = every
+        self._counters[category] = 0
+
+    def _sampled(self, category):
+        every = self._sampling.get(category)
+        if every is None:
+            return True
+
+        count = self._counters.get(category, 0)
+        self._counters[category] = count + 1
+        return count % every == 0
+
+    def debug(self, direction, *args, **kwargs):
+        if not self._debug:
+            return
+
+        try:
+            category = DIRECTIONS.get(direction, GENERAL)
+        except TypeError:
+            category = GENERAL
+
+        if not self._categories[category] or not self._sampled(category):
+            return
+
+        self.emit(
+            Record(
+                self.name,
+                DEBUG,
+                category,
+                direction,
+                args,
+                kwargs,
+                indent=self.indent
             )
+        )
 
-    @classmethod
-    def debug(cls, direction, *args, **kwargs):
+    def error(self, *args, **kwargs):
+        err = kwargs.pop('err', None)
+        exc_info = kwargs.pop('exc_info', False)
 
-        if cls.file_writer:
-            data = debug_data(*args, **kwargs)
-            data = data.replace('\n', '\n' + (' ' * 19))
+        if not self._error or not self._sampled(ERRORS):
+            return
+
+        if err is None:
+            err = 'Error'
+            exc_info = True
 
-            cls.file_writer(
-                '%s: DEBUG: %s  %s\n' %
-                (cls.name, direction, data)
+        if exc_info:
+            exc_info = sys.exc_info()
+            if exc_info[0] is None:
+                exc_info = None
+        else:
+            exc_info = None
+
+        self.emit(
+            Record(
+                self.name,
+                ERROR,
+                ERRORS,
+                err,
+                args,
+                kwargs,
+                exc_info,
+                self.indent
             )
+        )
+
+    def emit(self, record):
+        writer = self._file_writer
+        if writer is not None:
+            writer(record.format())
+
+        sinks = self._sinks
+        if sinks:
+            # formatted now, the arguments are the caller's objects and
+            # can be changed right after this returns. It also lets go
+            # of the traceback frames.
+            record.format()
+            for sink in sinks:
+                sink.put(record)
+
+
+class AsyncSink(object):
+    # Writes records from a background thread so logging never waits on
+    # the file or the console. Records are held in a ring buffer of
+    # capacity records, when the writer can not keep up the oldest ones
+    # are dropped and counted. Records come in formatted, the
+    # background thread only writes them.
+
+    def __init__(self, writer, capacity=1024):
+        if hasattr(writer, 'write'):
+            writer = writer.write
+
+        self.capacity = capacity
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self._writer = writer
+        self._buffer = deque()
+        self._busy = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, record):
+        with self._condition:
+            if self._closed:
+                self.dropped += 1
+                return
+
+            if len(self._buffer) >= self.capacity:
+                self._buffer.popleft()
+                self.dropped += 1
+
+            self._buffer.append(record)
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._buffer and not self._closed:
+                    self._condition.wait()
+
+                if not self._buffer:
+                    return
+
+                records = list(self._buffer)
+                self._buffer.clear()
+                self._busy = True
+
+            text = []
+            errors = 0
+            for record in records:
+                try:
+                    text += [record.format()]
+                except Exception:
+                    errors += 1
+
+            try:
+                self._writer(''.join(text))
+            except Exception:
+                errors += len(text)
+                text = []
+
+            with self._condition:
+                self.written += len(text)
+                self.errors += errors
+                self._busy = False
+                self._condition.notify_all()
+
+    @property
+    def pending(self):
+        return len(self._buffer)
+
+    def flush(self, timeout=None):
+        if timeout is not None:
+            timeout += time.time()
+
+        with self._condition:
+            while self._buffer or self._busy:
+                if not self._thread.is_alive():
+                    return False
+
+                if timeout is None:
+                    self._condition.wait()
+                else:
+                    remaining = timeout - time.time()
+                    if remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+        return True
+
+    def close(self, timeout=3.0):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._condition:
+            return dict(
+                pending=len(self._buffer),
+                written=self.written,
+                dropped=self.dropped,
+                errors=self.errors
+            )
+
+
+class MemorySink(object):
+    # Keeps the last size records, as text, so they can be dumped when
+    # something goes wrong.
+
+    def __init__(self, size=100):
+        self._records = deque(maxlen=size)
+
+    def put(self, record):
+        self._records.append(record)
+
+    def records(self):
+        return list(self._records)
+
+    def dump(self, writer=None):
+        text = ''.join(record.format() for record in self.records())
+
+        if writer is not None:
+            if hasattr(writer, 'write'):
+                writer = writer.write
+            writer(text)
+        return text
+
+    def clear(self):
+        self._records.clear()
+
+
+LOGGER = Logger(__name__.rsplit('.', 1)[0])
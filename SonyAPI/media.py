@@ -189,16 +189,24 @@ class ContentItem(ContentBase):
 
     def set(self):
         if 'tv' in self.uri:
-            self._sony_api.send(
+            return self._sony_api.send(
                 'avContent',
                 'setPlayTvContent',
                 channel=str(self.display_num)
             )
         else:
-            self._sony_api.send('avContent', 'setPlayContent', uri=self.uri)
+            return self._sony_api.send(
+                'avContent',
+                'setPlayContent',
+                uri=self.uri
+            )
 
     def delete(self):
-        self._sony_api.send('avContent', 'deleteContent', uri=self.uri)
+        return self._sony_api.send(
+            'avContent',
+            'deleteContent',
+            uri=self.uri
+        )
 
 
 class NowPlaying(ContentBase):
@@ -221,7 +229,8 @@ class NowPlaying(ContentBase):
         bivl_assetId='',
         bivl_serviceId='',
         playSpeed='',
-        programMediaType=''
+        programMediaType='',
+        sources=None
     ):
         self._sony_api = sony_api
         self.program_title = programTitle
@@ -240,7 +249,10 @@ class NowPlaying(ContentBase):
         self.play_speed = playSpeed
         self.program_media_type = programMediaType
 
-        for s in sony_api.source_list:
+        if sources is None:
+            sources = sony_api.source_list
+
+        for s in sources:
             if s.uri == source or s.uri == uri:
                 self.source = s
                 break
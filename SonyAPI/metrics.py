@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+from __future__ import absolute_import
+
+import time
+import bisect
+import threading
+
+# upper bounds of the latency buckets in seconds, anything slower ends
+# up in the last (overflow) bucket.
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+try:
+    clock = time.perf_counter
+except AttributeError:
+    clock = time.time
+
+
+class MethodMetrics(object):
+    __slots__ = ('calls', 'errors', 'total_time', 'max_time', 'buckets')
+
+    def __init__(self, bucket_count):
+        self.calls = 0
+        self.errors = {}
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.buckets = [0] * (bucket_count + 1)
+
+
+class Metrics(object):
+    # Call counts, error counts by exception class and a latency
+    # histogram for every (protocol, method) that is sent to the TV.
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.bucket_bounds = tuple(sorted(buckets))
+        self._methods = {}
+        self._lock = threading.Lock()
+
+    def record(self, protocol, method, duration, error=None):
+        key = (protocol, method)
+        index = bisect.bisect_left(self.bucket_bounds, duration)
+
+        with self._lock:
+            metrics = self._methods.get(key)
+            if metrics is None:
+                metrics = MethodMetrics(len(self.bucket_bounds))
+                self._methods[key] = metrics
+
+            metrics.calls += 1
+            metrics.total_time += duration
+            if duration > metrics.max_time:
+                metrics.max_time = duration
+            metrics.buckets[index] += 1
+
+            if error is not None:
+                name = error.__class__.__name__
+                metrics.errors[name] = metrics.errors.get(name, 0) + 1
+
+    def stats(self):
+        # {protocol: {method: {...}}} made of plain data so it can be
+        # serialized.
+        bounds = list(self.bucket_bounds) + [None]
+        res = {}
+
+        with self._lock:
+            for (protocol, method), metrics in self._methods.items():
+                res.setdefault(protocol, {})[method] = dict(
+                    calls=metrics.calls,
+                    errors=dict(metrics.errors),
+                    error_count=sum(metrics.errors.values()),
+                    total_time=metrics.total_time,
+                    mean_time=metrics.total_time / metrics.calls,
+                    max_time=metrics.max_time,
+                    histogram=list(zip(bounds, metrics.buckets))
+                )
+        return res
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
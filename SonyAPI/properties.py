@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Read only SonyAPI properties described as the JSON request that backs
+# them and how the value is pulled out of the result. Used by the clients
+# that can not go through the property objects on SonyAPI.
+
+from __future__ import absolute_import
+
+from .exception import (
+    SonyAPIError,
+    UnsupportedError,
+    NotImplementedError,
+    JSONRequestError,
+    SendError,
+    PinError
+)
+
+
+class Property(object):
+
+    def __init__(self, protocol, method, getter=None, optional=False):
+        self.protocol = protocol
+        self.method = method
+        self.getter = getter
+        self.optional = optional
+
+    def extract(self, result):
+        if self.getter is None:
+            return result
+        return self.getter(result)
+
+    def handle_error(self, err):
+        # mirrors the properties on SonyAPI that return None when the TV
+        # does not support the request.
+        if self.optional:
+            if isinstance(err, UnsupportedError):
+                return None
+            if isinstance(err, JSONRequestError) and err == self.method:
+                return self.extract({})
+        raise err
+
+
+def _key(*keys):
+    def getter(result):
+        for key in keys:
+            if result is None:
+                return None
+            result = result.get(key)
+        return result
+    return getter
+
+
+def _power_saving_mode(result):
+    mode = result['mode']
+    if mode == 'off':
+        return False
+    return mode
+
+
+def _wol_mac(result):
+    for option in result:
+        if option['option'] == 'WOL':
+            return option['value']
+
+
+def _chinese_software_keyboard(result):
+    for option in result:
+        if option['option'] == 'SupportedChineseSoftwareKeyboard':
+            if option['value'] != 'no':
+                return True
+    return False
+
+
+def _power(result):
+    return result['status'] == 'active'
+
+
+def _system(key):
+    return Property('system', 'getSystemInformation', _key(key))
+
+
+def _interface(key):
+    return Property('system', 'getInterfaceInformation', _key(key))
+
+
+def _network(key):
+    return Property('system', 'getNetworkSettings', _key(key), True)
+
+
+def _parental(key):
+    return Property('avContent', 'getParentalRatingSettings', _key(key))
+
+
+PROPERTIES = dict(
+    product=_system('product'),
+    mac=_system('macAddr'),
+    name=_system('name'),
+    language=_system('language'),
+    cid=_system('cid'),
+    generation=_system('generation'),
+    region=_system('region'),
+    area=_system('area'),
+    model=_system('model'),
+    serial=_system('serial'),
+    interface_server_name=_interface('serverName'),
+    interface_model_name=_interface('modelName'),
+    interface_product_name=_interface('productName'),
+    interface_product_category=_interface('productCategory'),
+    interface_version=_interface('interfaceVersion'),
+    network_ipv4=_network('ipAddrV4'),
+    network_netif=_network('netif'),
+    network_ipv6=_network('ipAddrV6'),
+    network_subnet_mask=_network('netmask'),
+    network_dns=_network('dns'),
+    network_mac=_network('hwAddr'),
+    network_gateway=_network('gateway'),
+    remote_model=Property(
+        'system',
+        'getRemoteControllerInfo',
+        _key('type')
+    ),
+    time_format=Property('system', 'getDateTimeFormat', _key('timeFormat')),
+    date_format=Property('system', 'getDateTimeFormat', _key('dateFormat')),
+    postal_code=Property(
+        'system',
+        'getPostalCode',
+        _key('postalCode'),
+        True
+    ),
+    power_saving_mode=Property(
+        'system',
+        'getPowerSavingMode',
+        _power_saving_mode
+    ),
+    wol_mode=Property('system', 'getWolMode', _key('enabled')),
+    color_keys_layout=Property(
+        'system',
+        'getColorKeysLayout',
+        _key('colorKeysLayout')
+    ),
+    led_indicator_status=Property(
+        'system',
+        'getLEDIndicatorStatus',
+        optional=True
+    ),
+    remote_device_settings=Property(
+        'system',
+        'getRemoteDeviceSettings',
+        optional=True
+    ),
+    wol_mac=Property('system', 'getSystemSupportedFunction', _wol_mac),
+    chinese_software_keyboard_supported=Property(
+        'system',
+        'getSystemSupportedFunction',
+        _chinese_software_keyboard
+    ),
+    power=Property('system', 'getPowerStatus', _power),
+    banner_mode=Property('videoScreen', 'getBannerMode'),
+    scene_setting=Property('videoScreen', 'getSceneSetting'),
+    pip_sub_screen_position=Property(
+        'videoScreen',
+        'getPipSubScreenPosition',
+        _key('position')
+    ),
+    audio_source_screen=Property(
+        'videoScreen',
+        'getAudioSourceScreen',
+        _key('screen')
+    ),
+    multi_screen_mode=Property(
+        'videoScreen',
+        'getMultiScreenMode',
+        _key('mode')
+    ),
+    multi_screen_internet_mode=Property(
+        'videoScreen',
+        'getMultiScreenMode',
+        _key('option', 'internetTVMode')
+    ),
+    parental_rating_setting_country=_parental('ratingCountry'),
+    parental_rating_setting_unrated=_parental('unratedLock'),
+    parental_rating_setting_age=_parental('ratingTypeAge'),
+    parental_rating_setting_sony=_parental('ratingTypeSony'),
+    parental_rating_setting_tv=_parental('ratingCustomTypeTV'),
+    parental_rating_setting_mpaa=_parental('ratingCustomTypeMpaa'),
+    parental_rating_setting_french=_parental('ratingCustomTypeCaFrench'),
+    parental_rating_setting_english=_parental('ratingCustomTypeCaEnglish'),
+    recording_status=Property(
+        'recording',
+        'getRecordingStatus',
+        _key('status')
+    ),
+    recording_supported_repeat_type=Property(
+        'recording',
+        'getSupportedRepeatType'
+    ),
+    volume_data=Property('audio', 'getVolumeInformation')
+)
+
+
+def group_requests(names):
+    # property names grouped by the request that backs them so each
+    # request is only sent once.
+    groups = {}
+
+    for name in names:
+        try:
+            prop = PROPERTIES[name]
+        except KeyError:
+            raise AttributeError('Unknown property %s' % name)
+
+        groups.setdefault((prop.protocol, prop.method), []).append(name)
+
+    return groups
+
+
+def build_snapshot(groups, results):
+    # properties the TV does not support are left out. Transport and
+    # authorization errors are raised, an offline TV is not a TV that
+    # supports nothing.
+    snapshot = {}
+
+    for _, err in results:
+        if isinstance(err, (SendError, PinError)):
+            raise err
+
+    for key, (result, err) in zip(groups.keys(), results):
+        for name in groups[key]:
+            prop = PROPERTIES[name]
+            try:
+                if err is None:
+                    value = prop.extract(result)
+                elif isinstance(err, (UnsupportedError, NotImplementedError)):
+                    continue
+                else:
+                    value = prop.handle_error(err)
+            except (
+                SonyAPIError,
+                AttributeError,
+                KeyError,
+                IndexError,
+                TypeError
+            ):
+                continue
+
+            snapshot[name] = value
+
+    return snapshot
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from __future__ import absolute_import
+
+import time
+import random
+import threading
+from .logger import LOGGER as _LOGGER
+from .exception import CircuitOpenError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class RetryPolicy(object):
+    # How often a read (get*) request is retried after a transport
+    # failure and how long to wait between the attempts. The wait doubles
+    # (factor) after every attempt up to max_delay, jitter spreads the
+    # retries of several clients so they do not hit the TV at once.
+
+    def __init__(
+        self,
+        attempts=3,
+        delay=0.25,
+        factor=2.0,
+        max_delay=5.0,
+        jitter=0.1
+    ):
+        self.attempts = max(1, attempts)
+        self.delay = delay
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delays(self):
+        # one delay for every retry, attempts - 1 in total
+        delay = self.delay
+        for _ in range(self.attempts - 1):
+            wait = min(delay, self.max_delay)
+            if self.jitter:
+                wait += wait * random.uniform(-self.jitter, self.jitter)
+            yield max(0.0, wait)
+            delay *= self.factor
+
+
+class CircuitBreaker(object):
+    # Stops requests from being sent to a TV that is not responding.
+    # After failure_threshold transport failures in a row the breaker
+    # opens and requests fail right away. Once reset_timeout seconds have
+    # passed the breaker is half open, a single request is let through
+    # as a probe, if it works the breaker closes, if not it opens again.
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if (
+                self._state == OPEN and
+                time.time() - self._opened_at >= self.reset_timeout
+            ):
+                return HALF_OPEN
+            return self._state
+
+    @property
+    def retry_after(self):
+        # seconds until the next probe is let through
+        with self._lock:
+            if self._state == CLOSED:
+                return 0.0
+            return max(
+                0.0,
+                self._opened_at + self.reset_timeout - time.time()
+            )
+
+    def allow(self):
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+
+            if self._state == OPEN:
+                if time.time() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self._state = HALF_OPEN
+                self._probing = False
+
+            if self._probing:
+                self.rejected += 1
+                return False
+
+            self._probing = True
+            return True
+
+    def check(self, name):
+        if not self.allow():
+            _LOGGER.error(name, err='CircuitOpenError')
+            raise CircuitOpenError(
+                'TV is not responding, %s not sent. Retry in %.1f seconds' %
+                (name, self.retry_after)
+            )
+
+    def record(self, success):
+        if success:
+            self.record_success()
+        else:
+            self.record_failure()
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._state = CLOSED
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if (
+                self._state == HALF_OPEN or
+                self.failures >= self.failure_threshold
+            ):
+                if self._state != OPEN:
+                    self.opened += 1
+                self._state = OPEN
+                self._opened_at = time.time()
+                self._probing = False
+
+    def reset(self):
+        with self._lock:
+            self.failures = 0
+            self._state = CLOSED
+            self._probing = False
+
+    def stats(self):
+        state = self.state
+        with self._lock:
+            return dict(
+                state=state,
+                failures=self.failures,
+                rejected=self.rejected,
+                opened=self.opened
+            )
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Request building, response parsing and method dispatch shared by the
+# blocking and the asyncio clients.
+
+from __future__ import absolute_import
+
+from . import codec
+from .logger import LOGGER as _LOGGER
+from .utils import version_key
+from .api_const import BODY
+from .exception import (
+    NotImplementedError,
+    UnsupportedError,
+    JSONRequestError,
+    PinError,
+    IRCCError,
+    SendError
+)
+
+
+def build_dispatch_index(methods):
+    dispatch = {}
+
+    for protocol, versions in methods.items():
+        for ver in sorted(versions.keys(), key=version_key):
+            for method in versions[ver]:
+                dispatch[(protocol, method)] = ver
+
+    return dispatch
+
+
+def lookup(dispatch, methods, protocol, method):
+    try:
+        return dispatch[(protocol, method)]
+    except KeyError:
+        if protocol not in methods:
+            raise UnsupportedError(
+                'Protocol %s is not supported by your TV' % protocol
+            )
+        raise UnsupportedError(
+            'Method %s is not supported by your TV' % method
+        )
+
+
+def build_params(version, params):
+    if not params:
+        return '1.0', [version]
+    return version, [params]
+
+
+def build_request(method, version, params):
+    return {
+        'method': method,
+        'params': params,
+        'id': 1,
+        'version': version
+    }
+
+
+def encode(data):
+    return codec.CODEC.dumps(data)
+
+
+def decode(content):
+    return codec.CODEC.loads(content)
+
+
+def decode_response(status, content, name):
+    if status in (401, 403):
+        _LOGGER.error(name, status, err='PinError')
+        raise PinError(
+            '%s was refused (HTTP %d), this device is not registered or '
+            'the PIN or PSK is invalid.' % (name, status)
+        )
+
+    try:
+        return decode(content)
+    except ValueError:
+        _LOGGER.error(name, status, err='SendError')
+        raise SendError(
+            '%s returned an invalid response (HTTP %d)' % (name, status)
+        )
+
+
+def check_ircc_status(status):
+    if status >= 400:
+        _LOGGER.error(status, err='IRCCError')
+        raise IRCCError('IRCC command was refused (HTTP %d)' % status)
+
+
+def parse_response(response, return_index=0):
+    err = response.get('error')
+
+    if err:
+        err_num, err_msg = err
+        if err_num == 501:
+            _LOGGER.error(err, err='NotImplementedError')
+            raise NotImplementedError(err_msg)
+
+        elif err_num == 15:
+            _LOGGER.error(err, err='UnsupportedError')
+            raise UnsupportedError(err_msg)
+        else:
+            _LOGGER.error(err, err='JSONRequestError')
+            raise JSONRequestError(err_num, err_msg)
+
+    if isinstance(response['result'], list):
+        return response['result'][return_index]
+    else:
+        return response['result']
+
+
+def parse_versions(response):
+    return response['result'][0]
+
+
+def parse_methods(response):
+    return list(res[0] for res in response['results'])
+
+
+def parse_command_list(result):
+    return dict(list(
+        (command['name'], command['value'])
+        for command in result
+    ))
+
+
+def ircc_payload(code):
+    return (BODY % code).encode('UTF-8')
+
+
+def ircc_payloads(command_list):
+    return dict(
+        (code, ircc_payload(code)) for code in command_list.values()
+    )
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+# Latency and fault injection for the emulated TV. A scenario is a JSON
+# file (or dict) that says, per endpoint, how long responses take and
+# what goes wrong.
+#
+# {
+#     "seed": 42,
+#     "endpoints": {
+#         "*": {"latency": {"distribution": "normal", "mean": 0.02,
+#                           "stddev": 0.005}},
+#         "avContent.getContentList": {"latency": {"distribution":
+#                                      "lognormal", "mu": -1.5,
+#                                      "sigma": 0.5}},
+#         "system": {"faults": [{"type": "timeout", "after": 10,
+#                                "count": 20, "duration": 30}]},
+#         "audio.setAudioVolume": {"faults": [{"type": "error", "code": 7,
+#                                              "probability": 0.1}]},
+#         "IRCC": {"throttle": {"rate": 5, "burst": 2, "mode": "reject"}}
+#     }
+# }
+#
+# Endpoint names are protocol.method, protocol or "*". latency, faults
+# and throttle are each taken from the most specific endpoint that sets
+# them. IRCC, accessControl and upnp are the names used for
+# remote commands, registration and event subscriptions.
+#
+# latency     a number of seconds or a distribution: constant (value),
+#             uniform (low, high), normal (mean, stddev), lognormal
+#             (mu, sigma) or exponential (mean)
+# faults      a list, the first one that applies is used:
+#             timeout     no response for duration seconds (default 30),
+#                         then the connection is closed
+#             reset       the connection is reset
+#             error       JSON-RPC error code (7, 12, 15, 501, ...)
+#             auth        HTTP 401
+#             http        HTTP status
+#             probability chance the fault happens (default 1)
+#             after       number of calls to the endpoint the fault is
+#                         set on before it starts (default 0)
+#             count       number of calls the fault lasts for
+# throttle    token bucket of rate requests per second and burst.
+#             mode "delay" (default) holds requests until there is a
+#             token, "reject" answers them with status (default 503).
+
+from __future__ import absolute_import
+
+import json
+import time
+import random
+import threading
+
+ERROR_MESSAGES = {
+    7: 'Illegal State',
+    12: 'No Such Method',
+    14: 'Unsupported Version',
+    15: 'unsupported',
+    40000: 'Display Is Turned off',
+    501: 'Not Implemented'
+}
+
+
+class Latency(object):
+    DISTRIBUTIONS = (
+        'constant',
+        'uniform',
+        'normal',
+        'lognormal',
+        'exponential'
+    )
+
+    def __init__(self, distribution='constant', **params):
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError('unknown distribution %r' % distribution)
+
+        self.distribution = distribution
+        self.params = params
+
+    @classmethod
+    def from_config(cls, config):
+        if config is None:
+            return None
+        if isinstance(config, (int, float)):
+            return cls('constant', value=config)
+        return cls(**config)
+
+    def sample(self, rng):
+        params = self.params
+        distribution = self.distribution
+
+        if distribution == 'constant':
+            value = params.get('value', 0.0)
+        elif distribution == 'uniform':
+            value = rng.uniform(params.get('low', 0.0), params['high'])
+        elif distribution == 'normal':
+            value = rng.gauss(params['mean'], params.get('stddev', 0.0))
+        elif distribution == 'lognormal':
+            value = rng.lognormvariate(params['mu'], params['sigma'])
+        else:
+            value = rng.expovariate(1.0 / params['mean'])
+
+        return max(0.0, value)
+
+
+class Fault(object):
+    TYPES = ('timeout', 'reset', 'error', 'auth', 'http')
+
+    def __init__(
+        self,
+        type,
+        probability=1.0,
+        after=0,
+        count=None,
+        code=None,
+        message=None,
+        status=None,
+        duration=30.0
+    ):
+        if type not in self.TYPES:
+            raise ValueError('unknown fault %r' % type)
+
+        if type == 'error' and code is None:
+            raise ValueError('error faults need a code')
+
+        if type == 'auth':
+            status = 401
+        elif type == 'http' and status is None:
+            status = 500
+
+        self.type = type
+        self.probability = probability
+        self.after = after
+        self.count = count
+        self.code = code
+        self.message = message
+        self.status = status
+        self.duration = duration
+
+    def applies(self, call, rng):
+        if call < self.after:
+            return False
+        if self.count is not None and call >= self.after + self.count:
+            return False
+        return self.probability >= 1.0 or rng.random() < self.probability
+
+    def error_message(self, method):
+        if self.message is not None:
+            return self.message
+        if self.code == 12:
+            return method
+        return ERROR_MESSAGES.get(self.code, 'Error')
+
+
+class Throttle(object):
+
+    def __init__(self, rate, burst=1, mode='delay', status=503):
+        if mode not in ('delay', 'reject'):
+            raise ValueError('unknown throttle mode %r' % mode)
+
+        self.rate = float(rate)
+        self.burst = burst
+        self.mode = mode
+        self.status = status
+        self._tokens = float(burst)
+        self._updated = time.time()
+
+    def take(self):
+        # seconds the request has to wait, None when it is rejected.
+        # Called with the scenario lock held.
+        now = time.time()
+        self._tokens = min(
+            self.burst,
+            self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return 0.0
+
+        if self.mode == 'reject':
+            return None
+
+        # the token is spent now, the request goes out when it arrives
+        wait = (1.0 - self._tokens) / self.rate
+        self._tokens -= 1.0
+        return wait
+
+
+class Endpoint(object):
+
+    def __init__(self, latency=None, faults=None, throttle=None):
+        self.latency = Latency.from_config(latency)
+        self.faults = list(Fault(**fault) for fault in (faults or []))
+        if throttle is None:
+            self.throttle = None
+        else:
+            self.throttle = Throttle(**throttle)
+        self.calls = 0
+
+
+class Scenario(object):
+
+    def __init__(self, endpoints=None, seed=None):
+        self.seed = seed
+        self.endpoints = dict(
+            (name, Endpoint(**config))
+            for name, config in (endpoints or {}).items()
+        )
+        self.injected = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, scenario):
+        # a Scenario, a dict or the path to a JSON file
+        if scenario is None or isinstance(scenario, Scenario):
+            return scenario
+
+        if not isinstance(scenario, dict):
+            with open(scenario, 'r') as f:
+                scenario = json.load(f)
+
+        return cls(scenario.get('endpoints'), scenario.get('seed'))
+
+    def matching(self, protocol, method):
+        # most specific first
+        endpoints = self.endpoints
+        return list(
+            endpoints[name]
+            for name in ('%s.%s' % (protocol, method), protocol, '*')
+            if name in endpoints
+        )
+
+    def plan(self, protocol, method):
+        # (delay, fault) for the next request to protocol.method
+        endpoints = self.matching(protocol, method)
+        if not endpoints:
+            return 0.0, None
+
+        latency = None
+        throttle = None
+        faults = None
+        calls = {}
+
+        with self._lock:
+            for endpoint in endpoints:
+                calls[id(endpoint)] = endpoint.calls
+                endpoint.calls += 1
+
+                if latency is None:
+                    latency = endpoint.latency
+                if throttle is None:
+                    throttle = endpoint.throttle
+                if faults is None and endpoint.faults:
+                    faults = endpoint
+
+            delay = 0.0
+            if latency is not None:
+                delay = latency.sample(self._rng)
+
+            fault = None
+            if throttle is not None:
+                wait = throttle.take()
+                if wait is None:
+                    fault = Fault('http', status=throttle.status)
+                    self._injected('throttle')
+                else:
+                    delay += wait
+
+            if fault is None and faults is not None:
+                call = calls[id(faults)]
+                for candidate in faults.faults:
+                    if candidate.applies(call, self._rng):
+                        fault = candidate
+                        self._injected(fault.type)
+                        break
+
+        return delay, fault
+
+    def _injected(self, name):
+        self.injected[name] = self.injected.get(name, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            for endpoint in self.endpoints.values():
+                endpoint.calls = 0
+            self.injected.clear()
+            if self.seed is not None:
+                self._rng.seed(self.seed)
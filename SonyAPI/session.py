@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from __future__ import absolute_import
+
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class _Connection(object):
+    # A single keep-alive connection to the TV. Each requests.Session is
+    # limited to one socket per host so the pool can account for reuse.
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.request_count = 0
+        self.last_used = time.time()
+
+    def close(self):
+        self.session.close()
+
+
+class SessionPool(object):
+
+    def __init__(
+        self,
+        pool_size=4,
+        idle_timeout=30.0,
+        max_requests=100,
+        hooks=None
+    ):
+        self.hooks = hooks
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+        self.hits = 0
+        self.misses = 0
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _expired(self, connection, now):
+        idle_time = now - connection.last_used
+        if self.idle_timeout and idle_time > self.idle_timeout:
+            return True
+
+        request_count = connection.request_count
+        if self.max_requests and request_count >= self.max_requests:
+            return True
+
+        return False
+
+    def _acquire(self):
+        now = time.time()
+        expired = []
+
+        with self._lock:
+            connection = None
+            while self._idle:
+                candidate = self._idle.pop()
+                if self._expired(candidate, now):
+                    expired += [candidate]
+                else:
+                    connection = candidate
+                    break
+
+            if connection is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        for candidate in expired:
+            candidate.close()
+
+        if connection is None:
+            connection = _Connection()
+        return connection
+
+    def _release(self, connection, reusable=True):
+        connection.request_count += 1
+        connection.last_used = time.time()
+
+        if reusable and not self._expired(connection, connection.last_used):
+            with self._lock:
+                if len(self._idle) < self.pool_size:
+                    self._idle.append(connection)
+                    return
+
+        connection.close()
+
+    def request(self, method, url, operation=None, **kwargs):
+        # operation is (kind, protocol, method), it is only used by the hooks
+        hooks = self.hooks
+        if not hooks:
+            return self._request(method, url, **kwargs)
+
+        payload = hooks.start(method, url, operation, kwargs.get('data'))
+        try:
+            response = self._request(method, url, **kwargs)
+        except BaseException as err:
+            hooks.end(payload, error=err)
+            raise
+
+        hooks.end(payload, response)
+        return response
+
+    def _request(self, method, url, **kwargs):
+        connection = self._acquire()
+        try:
+            response = connection.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self._release(connection, False)
+            raise
+
+        self._release(connection)
+        return response
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                idle=len(self._idle),
+                pool_size=self.pool_size
+            )
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def close(self):
+        with self._lock:
+            idle = self._idle[:]
+            del self._idle[:]
+
+        for connection in idle:
+            connection.close()
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Process mode for Fleet. The devices are split over worker processes
+# by a hash of their name so a device always lands in the same process,
+# and every worker runs a thread Fleet that keeps its clients between
+# operations. Values are turned into plain data (dicts, lists, strings
+# and numbers) in the worker, objects such as ContentItem become a dict
+# of their public attributes, so only small picklable tuples cross the
+# process boundary.
+
+from __future__ import absolute_import
+
+import time
+import zlib
+import pickle
+import itertools
+import threading
+import multiprocessing
+from .logger import LOGGER as _LOGGER
+from .exception import SendError
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+_SCALARS = (type(None), bool, int, float, str, bytes)
+
+try:
+    _SCALARS += (long, unicode)
+except NameError:
+    pass
+
+
+def compact(value, depth=8):
+    if isinstance(value, _SCALARS) or depth == 0:
+        return value
+    if isinstance(value, dict):
+        return dict(
+            (key, compact(item, depth - 1)) for key, item in value.items()
+        )
+    if isinstance(value, (list, tuple, set)):
+        return list(compact(item, depth - 1) for item in value)
+    if hasattr(value, '__dict__'):
+        return dict(
+            (key, compact(item, depth - 1))
+            for key, item in vars(value).items()
+            if not key.startswith('_')
+        )
+    return value
+
+
+def _dumps(message):
+    return pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+
+
+class _ShardBatch(object):
+    # stands in for the parent's Batch inside a worker
+
+    def __init__(self, batch_id, results):
+        self.batch_id = batch_id
+        self._results = results
+
+    def _put(self, result):
+        try:
+            message = _dumps((
+                self.batch_id,
+                result.name,
+                compact(result.value),
+                result.error,
+                result.duration
+            ))
+        except Exception:
+            if result.error is None:
+                err = result.value
+            else:
+                err = result.error
+            message = _dumps((
+                self.batch_id,
+                result.name,
+                None,
+                SendError(
+                    '%s could not be pickled: %r' % (err.__class__, err)
+                ),
+                result.duration
+            ))
+        self._results.put(message)
+
+
+def _worker(requests, results, workers, per_device, factory, options):
+    from .fleet import Fleet
+
+    fleet = Fleet(
+        workers=workers,
+        per_device=per_device,
+        factory=factory,
+        **options
+    )
+
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+
+        message = pickle.loads(message)
+        if message[0] == 'add':
+            fleet.add(*message[1:])
+        elif message[0] == 'remove':
+            fleet.remove(message[1])
+        else:
+            _, batch_id, names, operation = message
+            fleet._dispatch(
+                operation,
+                names,
+                _ShardBatch(batch_id, results)
+            )
+
+    fleet.close()
+
+
+class ShardPool(object):
+    # A worker process that dies takes its clients with it. Every device
+    # of that shard that still owes a result gets a SendError result,
+    # later operations get one right away, so callers never wait on a
+    # process that is gone.
+
+    check_interval = 1.0
+
+    def __init__(self, processes, workers, per_device, factory, options):
+        self._results = multiprocessing.Queue()
+        self._requests = []
+        self._processes = []
+        self._batches = {}
+        # per shard, batch id -> names that have not answered
+        self._outstanding = list({} for _ in range(processes))
+        self._dead = {}
+        self._closing = False
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+        for _ in range(processes):
+            requests = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=_worker,
+                args=(
+                    requests,
+                    self._results,
+                    workers,
+                    per_device,
+                    factory,
+                    options
+                )
+            )
+            process.daemon = True
+            process.start()
+            self._requests += [requests]
+            self._processes += [process]
+
+        self._thread = threading.Thread(target=self._read_results)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _index(self, name):
+        index = zlib.crc32(str(name).encode('utf-8')) & 0xFFFFFFFF
+        return index % len(self._requests)
+
+    # messages are pickled before they are put on a queue so an
+    # operation that cannot be pickled raises in the caller and not in
+    # the queue's feeder thread.
+
+    def add(self, name, address, per_device):
+        self._requests[self._index(name)].put(
+            _dumps(('add', name, address, per_device))
+        )
+
+    def remove(self, name):
+        self._requests[self._index(name)].put(_dumps(('remove', name)))
+
+    def run(self, operation, batch):
+        if not batch.names:
+            return
+
+        shards = {}
+        for name in batch.names:
+            shards.setdefault(self._index(name), []).append(name)
+
+        batch_id = next(self._ids)
+        messages = list(
+            (index, _dumps(('run', batch_id, names, operation)))
+            for index, names in shards.items()
+        )
+
+        failed = []
+        with self._lock:
+            self._batches[batch_id] = [batch, len(batch.names)]
+            for index, names in shards.items():
+                if index in self._dead:
+                    failed += list((name, self._dead[index]) for name in names)
+                else:
+                    self._outstanding[index][batch_id] = set(names)
+
+        for index, message in messages:
+            if index not in self._dead:
+                self._requests[index].put(message)
+
+        for name, err in failed:
+            self._deliver(batch_id, name, None, err, 0.0)
+
+    def _deliver(self, batch_id, name, value, error, duration):
+        from .fleet import Result
+
+        with self._lock:
+            entry = self._batches[batch_id]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._batches[batch_id]
+
+        entry[0]._put(Result(name, value, error, duration))
+
+    def _read_results(self):
+        next_check = time.time() + self.check_interval
+
+        while True:
+            try:
+                message = self._results.get(timeout=self.check_interval)
+            except queue.Empty:
+                message = False
+
+            if message is None:
+                break
+
+            if time.time() >= next_check:
+                self._check_workers()
+                next_check = time.time() + self.check_interval
+
+            if message is False:
+                continue
+
+            batch_id, name, value, error, duration = pickle.loads(message)
+            with self._lock:
+                outstanding = self._outstanding[self._index(name)]
+                names = outstanding.get(batch_id)
+                if names is None or name not in names:
+                    # failed when its worker died
+                    continue
+                names.discard(name)
+                if not names:
+                    del outstanding[batch_id]
+
+            self._deliver(batch_id, name, value, error, duration)
+
+    def _check_workers(self):
+        if self._closing:
+            return
+
+        for index, process in enumerate(self._processes):
+            if index in self._dead or process.is_alive():
+                continue
+
+            err = SendError(
+                'fleet worker process %s exited with code %s' %
+                (process.pid, process.exitcode)
+            )
+            with self._lock:
+                self._dead[index] = err
+                outstanding = self._outstanding[index]
+                self._outstanding[index] = {}
+
+            for batch_id, names in outstanding.items():
+                for name in names:
+                    self._deliver(batch_id, name, None, err, 0.0)
+
+    def close(self, timeout=5.0):
+        self._closing = True
+
+        for requests in self._requests:
+            requests.put(None)
+
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                _LOGGER.error(process.pid, err='ShardTimeout')
+                process.terminate()
+
+        self._results.put(None)
+        self._thread.join(timeout)
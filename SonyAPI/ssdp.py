@@ -0,0 +1,490 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# SSDP discovery. M-SEARCH is sent from every interface and sent again
+# a few times because UDP packets get lost (UPnP Device Architecture
+# 1.1, 1.3.2), the TVs are yielded as their replies come in. Monitor
+# listens for the NOTIFY messages instead and keeps a list of the TVs
+# that are on.
+
+from __future__ import absolute_import
+
+import time
+import select
+import socket
+import threading
+from .logger import LOGGER as _LOGGER
+from .api_const import SSDP_ADDR, SSDP_PORT, SSDP_MX, SSDP_ST
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+
+def build_search(st=SSDP_ST, mx=SSDP_MX):
+    return (
+        'M-SEARCH * HTTP/1.1\r\n'
+        'HOST: %s:%d\r\n'
+        'MAN: "ssdp:discover"\r\n'
+        'MX: %d\r\n'
+        'ST: %s\r\n'
+        '\r\n' % (SSDP_ADDR, SSDP_PORT, mx, st)
+    ).encode('utf-8')
+
+
+def parse_headers(data):
+    # returns the start line and the headers with lower case names
+    lines = data.decode('utf-8', 'replace').split('\r\n')
+    headers = {}
+
+    for line in lines[1:]:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip()
+
+    return lines[0], headers
+
+
+class Device(object):
+    __slots__ = ('address', 'location', 'usn', 'server', 'st', 'headers')
+
+    def __init__(self, address, headers):
+        self.headers = headers
+        self.location = headers.get('location')
+        self.usn = headers.get('usn')
+        self.server = headers.get('server')
+        self.st = headers.get('st') or headers.get('nt')
+
+        if self.location:
+            address = urlparse(self.location).hostname or address
+        self.address = address
+
+    @property
+    def uuid(self):
+        # uuid:<device-UUID>::urn:schemas-sony-com:service:...
+        if self.usn and self.usn.startswith('uuid:'):
+            return self.usn[5:].split('::', 1)[0]
+        return None
+
+    @property
+    def key(self):
+        return self.usn or self.address
+
+    def __repr__(self):
+        return '<Device %s %s>' % (self.address, self.usn)
+
+
+def parse_response(data, address):
+    start_line, headers = parse_headers(data)
+    if not start_line.startswith('HTTP/') or ' 200' not in start_line:
+        return None
+    return Device(address, headers)
+
+
+class Discovery(object):
+    # interfaces is a list of the ip addresses of the local interfaces
+    # to search from, the default is whatever interface the OS picks.
+    # retransmit is the number of times M-SEARCH is sent, interval
+    # seconds apart.
+
+    def __init__(
+        self,
+        st=SSDP_ST,
+        interfaces=None,
+        mx=SSDP_MX,
+        retransmit=3,
+        interval=1.0,
+        ttl=2,
+        target=(SSDP_ADDR, SSDP_PORT)
+    ):
+        self.st = st
+        self.interfaces = list(interfaces or [''])
+        self.mx = mx
+        self.retransmit = max(1, retransmit)
+        self.interval = interval
+        self.ttl = ttl
+        self.target = target
+
+    def _open(self):
+        sockets = []
+
+        for interface in self.interfaces:
+            sock = socket.socket(
+                socket.AF_INET,
+                socket.SOCK_DGRAM,
+                socket.IPPROTO_UDP
+            )
+            try:
+                sock.setsockopt(
+                    socket.IPPROTO_IP,
+                    socket.IP_MULTICAST_TTL,
+                    self.ttl
+                )
+                if interface:
+                    sock.setsockopt(
+                        socket.IPPROTO_IP,
+                        socket.IP_MULTICAST_IF,
+                        socket.inet_aton(interface)
+                    )
+                sock.bind((interface, 0))
+            except socket.error:
+                _LOGGER.error(interface, err='SSDPError', exc_info=True)
+                sock.close()
+                continue
+
+            sock.setblocking(False)
+            sockets += [sock]
+
+        return sockets
+
+    def _send(self, sockets, request):
+        for sock in sockets:
+            try:
+                sock.sendto(request, self.target)
+            except socket.error:
+                _LOGGER.error(
+                    sock.getsockname(),
+                    err='SSDPError',
+                    exc_info=True
+                )
+
+    def search(self, timeout=10.0, max_devices=None, idle_timeout=None):
+        # yields a Device for every TV that answers. Stops after timeout
+        # seconds, once max_devices have been found or when nothing new
+        # has turned up for idle_timeout seconds.
+        sockets = self._open()
+        if not sockets:
+            return
+
+        request = build_search(self.st, self.mx)
+        found = set()
+        now = time.time()
+        expires = now + timeout
+        idle_expires = None if idle_timeout is None else now + idle_timeout
+        sent = 0
+        next_send = now
+
+        try:
+            while True:
+                now = time.time()
+                if sent < self.retransmit and now >= next_send:
+                    self._send(sockets, request)
+                    sent += 1
+                    next_send = now + self.interval
+
+                stop = expires
+                if idle_expires is not None:
+                    stop = min(stop, idle_expires)
+                if now >= stop:
+                    return
+
+                wait = stop - now
+                if sent < self.retransmit:
+                    wait = min(wait, next_send - now)
+
+                readable = select.select(sockets, [], [], max(0.0, wait))[0]
+
+                for sock in readable:
+                    try:
+                        data, (address, _) = sock.recvfrom(2048)
+                    except socket.error:
+                        continue
+
+                    device = parse_response(data, address)
+                    if device is None or device.key in found:
+                        continue
+                    if device.st and device.st != self.st:
+                        continue
+
+                    found.add(device.key)
+                    _LOGGER.debug(
+                        '||',
+                        address=device.address,
+                        usn=device.usn,
+                        location=device.location
+                    )
+                    yield device
+
+                    if idle_timeout is not None:
+                        idle_expires = time.time() + idle_timeout
+                    if max_devices is not None and len(found) >= max_devices:
+                        return
+        finally:
+            for sock in sockets:
+                sock.close()
+
+
+def discover(timeout=10.0, max_devices=None, idle_timeout=None, **kwargs):
+    return Discovery(**kwargs).search(timeout, max_devices, idle_timeout)
+
+
+ADDED = 'added'
+UPDATED = 'updated'
+REMOVED = 'removed'
+EXPIRED = 'expired'
+
+
+def max_age(headers, default=1800):
+    # CACHE-CONTROL: max-age=1800
+    for part in headers.get('cache-control', '').split(','):
+        key, _, value = part.partition('=')
+        if key.strip().lower() == 'max-age':
+            try:
+                return int(value.strip())
+            except ValueError:
+                break
+    return default
+
+
+class Presence(object):
+    __slots__ = ('device', 'first_seen', 'last_seen', 'expires')
+
+    def __init__(self, device, now):
+        self.device = device
+        self.first_seen = now
+        self.last_seen = now
+        self.expires = now + max_age(device.headers)
+
+    def __repr__(self):
+        return '<Presence %s last seen %.1f seconds ago>' % (
+            self.device.address,
+            time.time() - self.last_seen
+        )
+
+
+class Monitor(object):
+    # Keeps track of the TVs that are on the network by listening to
+    # the ssdp:alive and ssdp:byebye NOTIFY messages they multicast, no
+    # requests are sent to the TVs. A TV that has not announced itself
+    # within the max-age it gave is dropped.
+    #
+    # Subscribers are called with (change, presence) from the monitor
+    # thread, change is one of ADDED, UPDATED (the LOCATION changed),
+    # REMOVED (ssdp:byebye) or EXPIRED.
+
+    def __init__(self, st=SSDP_ST, interfaces=None, port=SSDP_PORT):
+        self.st = st
+        self.interfaces = list(interfaces or [''])
+        self.port = port
+        self._devices = {}
+        self._subscribers = ()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._sock = None
+
+    @property
+    def devices(self):
+        with self._lock:
+            return dict(self._devices)
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __contains__(self, key):
+        return key in self._devices
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers += (callback,)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = tuple(
+                c for c in self._subscribers if c is not callback
+            )
+
+    def _notify(self, change, presence):
+        _LOGGER.debug(
+            '||',
+            change=change,
+            address=presence.device.address,
+            usn=presence.device.usn
+        )
+        for callback in self._subscribers:
+            try:
+                callback(change, presence)
+            except Exception:
+                _LOGGER.error(err='SubscriberError', exc_info=True)
+
+    def handle(self, data, address):
+        # processes one datagram, NOTIFY or an M-SEARCH reply
+        start_line, headers = parse_headers(data)
+
+        if start_line.startswith('NOTIFY'):
+            if headers.get('nt') != self.st:
+                return
+            nts = headers.get('nts')
+        elif start_line.startswith('HTTP/') and ' 200' in start_line:
+            if headers.get('st') != self.st:
+                return
+            nts = 'ssdp:alive'
+        else:
+            return
+
+        device = Device(address, headers)
+        now = time.time()
+        change = None
+
+        with self._lock:
+            presence = self._devices.get(device.key)
+
+            if nts == 'ssdp:byebye':
+                if presence is not None:
+                    del self._devices[device.key]
+                    change = REMOVED
+
+            elif nts in ('ssdp:alive', 'ssdp:update'):
+                if presence is None:
+                    presence = Presence(device, now)
+                    self._devices[device.key] = presence
+                    change = ADDED
+                else:
+                    if presence.device.location != device.location:
+                        change = UPDATED
+                    presence.device = device
+                    presence.last_seen = now
+                    presence.expires = now + max_age(headers)
+
+        if change is not None:
+            self._notify(change, presence)
+
+    def expire(self, now=None):
+        if now is None:
+            now = time.time()
+
+        with self._lock:
+            expired = list(
+                (key, presence)
+                for key, presence in self._devices.items()
+                if presence.expires <= now
+            )
+            for key, _ in expired:
+                del self._devices[key]
+
+        for _, presence in expired:
+            self._notify(EXPIRED, presence)
+
+    def _open(self):
+        # None when the port can not be bound or no interface could
+        # join the multicast group
+        sock = socket.socket(
+            socket.AF_INET,
+            socket.SOCK_DGRAM,
+            socket.IPPROTO_UDP
+        )
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, 'SO_REUSEPORT'):
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            except socket.error:
+                pass
+
+        try:
+            sock.bind(('', self.port))
+        except socket.error:
+            _LOGGER.error(self.port, err='SSDPError', exc_info=True)
+            sock.close()
+            return None
+
+        self.port = sock.getsockname()[1]
+
+        joined = 0
+        for interface in self.interfaces:
+            try:
+                sock.setsockopt(
+                    socket.IPPROTO_IP,
+                    socket.IP_ADD_MEMBERSHIP,
+                    socket.inet_aton(SSDP_ADDR) +
+                    socket.inet_aton(interface or '0.0.0.0')
+                )
+            except socket.error:
+                _LOGGER.error(interface, err='SSDPError', exc_info=True)
+                continue
+            joined += 1
+
+        if not joined:
+            sock.close()
+            return None
+
+        sock.setblocking(False)
+        return sock
+
+    def start(self, search=True):
+        # search sends one M-SEARCH so the TVs that are already on are
+        # known right away, otherwise they show up with their next
+        # ssdp:alive which can take half of max-age. When the socket can
+        # not be opened the error is logged and the monitor does not run.
+        if self._thread is not None:
+            return self
+
+        self._sock = self._open()
+        if self._sock is None:
+            return self
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(search,))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def _run(self, search):
+        sock = self._sock
+
+        sockets = []
+        if search:
+            discovery = Discovery(self.st, self.interfaces)
+            sockets = discovery._open()
+            discovery._send(sockets, build_search(self.st))
+
+        try:
+            while not self._stop_event.is_set():
+                readable = select.select([sock] + sockets, [], [], 1.0)[0]
+
+                for s in readable:
+                    try:
+                        data, (address, _) = s.recvfrom(2048)
+                    except socket.error:
+                        continue
+                    self.handle(data, address)
+
+                self.expire()
+        finally:
+            for s in sockets:
+                s.close()
+            sock.close()
+
+    def stop(self, timeout=3.0):
+        thread = self._thread
+        if thread is None:
+            return
+
+        self._stop_event.set()
+        thread.join(timeout)
+        self._thread = None
+        self._sock = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *_):
+        self.stop()
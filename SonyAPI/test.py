@@ -24,7 +24,7 @@ import traceback
 try:
     Error = getattr(__import__('__builtin__'), 'Exception')
 except ImportError:
-    Error = getattr(__import__('builtins.Exception'), 'Exception')
+    Error = getattr(__import__('builtins'), 'Exception')
 
 ATTR_NAMES = (
     'audio_channel',
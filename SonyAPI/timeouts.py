@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from __future__ import absolute_import
+
+import time
+
+
+class Timeouts(object):
+    # Seconds a request is allowed to take. The most specific setting
+    # wins: per call, (protocol, method), method, protocol, default.
+
+    def __init__(
+        self,
+        default=10.0,
+        connect=None,
+        protocols=None,
+        methods=None
+    ):
+        self.default = default
+        self.connect = connect
+        self.protocols = dict(protocols or {})
+        self.methods = dict(methods or {})
+
+    def resolve(self, protocol=None, method=None, timeout=None):
+        if timeout is not None:
+            return timeout
+
+        methods = self.methods
+        if methods:
+            if (protocol, method) in methods:
+                return methods[(protocol, method)]
+            if method in methods:
+                return methods[method]
+
+        if protocol in self.protocols:
+            return self.protocols[protocol]
+
+        return self.default
+
+    def requests_timeout(self, timeout):
+        # (connect, read) tuple for requests, read limits every read from
+        # the socket and not the time the whole response takes.
+        if timeout is None:
+            return None
+
+        connect = self.connect
+        if connect is None or connect > timeout:
+            connect = timeout
+        return connect, timeout
+
+
+class Deadline(object):
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        if timeout is None:
+            self.expires = None
+        else:
+            self.expires = time.time() + timeout
+
+    @property
+    def remaining(self):
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.time())
+
+    @property
+    def expired(self):
+        return self.expires is not None and time.time() >= self.expires
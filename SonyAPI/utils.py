@@ -21,49 +21,112 @@
 
 from __future__ import absolute_import
 
+import os
 import re
 import time
+import socket
 import requests
 import threading
 from .logger import LOGGER as _LOGGER
 from subprocess import Popen, PIPE
 from datetime import datetime
-
-try:
-    StringIO = __import__('cStringIO.StringIO')
-except ImportError:
-    from io import StringIO
+from io import BytesIO
 
 DATE = '%Y-%m-%dT%H:%M:%S'
 
 
-def get_mac_addresses(ip_addresses):
-    for ip_address in ip_addresses:
-        Popen(["ping", "-c 1", ip_address], stdout=PIPE)
-    proc = Popen("arp -a", stdout=PIPE)
-    data = proc.communicate()[0]
-
-    results = []
-
-    for ip_address in ip_addresses[:]:
-        if ip_address in data:
-            ip_data = data[data.find(ip_address):]
-            mac = re.search(r"(([a-f\d]{1,2}:){5}[a-f\d]{1,2})", ip_data)
-            if mac is None:
-                mac = re.search(r"(([a-f\d]{1,2}-){5}[a-f\d]{1,2})", ip_data)
-            if mac is not None:
-                mac = mac.groups()[0].replace('-', ':').upper()
-            else:
-                mac = '00:00:00:00:00:00'
-            results += [[ip_address, mac]]
-            ip_addresses.remove(ip_address)
-            _LOGGER.debug(
-                '||',
-                results=results,
-                ip_address=ip_address,
-                mac=mac
-            )
+def version_key(version):
+    key = []
+    for part in str(version).split('.'):
+        try:
+            key += [int(part)]
+        except ValueError:
+            key += [-1]
+    return tuple(key)
+
+
+ARP_TABLE = '/proc/net/arp'
+NO_MAC = '00:00:00:00:00:00'
+MAC_RE = re.compile(r'(([a-f\d]{1,2}[:-]){5}[a-f\d]{1,2})', re.I)
+IP_RE = re.compile(r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b')
+
+
+def read_arp_table(path=ARP_TABLE):
+    # ip address -> MAC address from the kernel's neighbor table, on
+    # systems without /proc arp -a is used.
+    table = {}
+
+    if os.path.exists(path):
+        with open(path) as f:
+            next(f, None)
+            for line in f:
+                fields = line.split()
+                # flags 0x0 is an incomplete entry
+                if len(fields) >= 4 and fields[2] != '0x0':
+                    table[fields[0]] = fields[3].upper()
+    else:
+        try:
+            data = Popen(['arp', '-a'], stdout=PIPE).communicate()[0]
+        except OSError:
+            return table
+
+        for line in data.decode('utf-8', 'replace').splitlines():
+            ip_address = IP_RE.search(line)
+            mac = MAC_RE.search(line)
+            if ip_address and mac:
+                table[ip_address.group()] = (
+                    mac.group(1).replace('-', ':').upper()
+                )
+
+    return dict(
+        (ip_address, mac) for ip_address, mac in table.items()
+        if mac != NO_MAC
+    )
+
 
+def probe_addresses(ip_addresses, port=9):
+    # an empty UDP packet to the discard port makes the kernel resolve
+    # the address, one socket sends them all without waiting.
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    try:
+        for ip_address in ip_addresses:
+            try:
+                sock.sendto(b'', (ip_address, port))
+            except socket.error:
+                pass
+    finally:
+        sock.close()
+
+
+def get_mac_addresses(ip_addresses, timeout=1.0, interval=0.02):
+    # returns [[ip_address, mac], ...] in the order given, addresses
+    # that could not be resolved within timeout seconds get NO_MAC.
+    table = read_arp_table()
+    unknown = list(ip for ip in ip_addresses if ip not in table)
+
+    if unknown:
+        probe_addresses(unknown)
+
+        if os.path.exists(ARP_TABLE):
+            expires = time.time() + timeout
+
+            while unknown and time.time() < expires:
+                time.sleep(interval)
+                table = read_arp_table()
+                unknown = list(ip for ip in unknown if ip not in table)
+        else:
+            # reading the table starts an arp process, it is only done
+            # once after waiting for the replies.
+            time.sleep(timeout)
+            table = read_arp_table()
+            unknown = list(ip for ip in unknown if ip not in table)
+
+    results = list(
+        [ip_address, table.get(ip_address, NO_MAC)]
+        for ip_address in ip_addresses
+    )
+    _LOGGER.debug('||', results=results, unresolved=unknown)
     return results
 
 
@@ -75,10 +138,11 @@ def cache_icons(sony_api, event):
 
     def get_icons():
 
-        while applications and not event.isSet():
-            lock1.acquire()
-            app = applications.pop(0)
-            lock1.release()
+        while not event.is_set():
+            with lock1:
+                if not applications:
+                    break
+                app = applications.pop(0)
             icon = app['icon']
             if (
                 icon and
@@ -86,7 +150,13 @@ def cache_icons(sony_api, event):
                 icon not in sony_api.icon_cache
             ):
                 try:
-                    tmp_icon = get_icon(icon)
+                    tmp_icon = get_icon(
+                        icon,
+                        sony_api.connection_pool,
+                        sony_api.timeouts.requests_timeout(
+                            sony_api.timeouts.resolve('icon', 'GET')
+                        )
+                    )
                     lock2.acquire()
                     sony_api.icon_cache[icon] = tmp_icon
                     lock2.release()
@@ -98,24 +168,20 @@ def cache_icons(sony_api, event):
         threads += [threading.Thread(target=get_icons)]
         threads[-1].start()
 
-    while applications and not event.isSet():
-        pass
+    for thread in threads:
+        thread.join()
 
-    if event.isSet():
-        for thread in threads:
-            if thread.isAlive():
-                thread.join(3.0)
 
-
-def get_icon(url):
-    icon_data = requests.get(url).content
-    icon = StringIO()
-    try:
-        icon.write(icon_data)
-    except:
-        pass
-    icon.seek(0)
-    return icon
+def get_icon(url, session=None, timeout=None):
+    if session is None:
+        icon_data = requests.get(url, timeout=timeout).content
+    else:
+        icon_data = session.get(
+            url,
+            timeout=timeout,
+            operation=('icon', None, 'GET')
+        ).content
+    return BytesIO(icon_data)
 
 
 class PlayTimeMixin(object):
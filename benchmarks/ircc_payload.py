@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Per key press cost of the IRCC request body and headers, formatting the
+# SOAP envelope and copying the headers on every call vs. the payloads
+# and headers SonyAPI builds once. The first numbers only time that work
+# (the precompiled side is a dict lookup), the second ones send the key
+# presses through SonyAPI.ircc to the emulated TV, with and without the
+# precompiled payloads.
+#
+#   python benchmarks/ircc_payload.py [iterations] [requests]
+
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import SonyAPI as _sony_api  # NOQA
+from SonyAPI import rpc  # NOQA
+from SonyAPI.api_const import BODY, HEADER  # NOQA
+from SonyAPI.metrics import clock  # NOQA
+from SonyAPI.emulator import Emulator  # NOQA
+
+PSK = '1234'
+COMMAND_LIST = dict(
+    ('Command%d' % i, 'AAAAAQAAAAEAAAA%sAw==' % chr(65 + (i % 26)))
+    for i in range(100)
+)
+CODES = list(COMMAND_LIST.values())
+PAYLOADS = rpc.ircc_payloads(COMMAND_LIST)
+
+
+def before():
+    for code in CODES:
+        headers = dict(HEADER)
+        headers['X-Auth-PSK'] = PSK
+        (BODY % code).encode('UTF-8')
+
+
+def after():
+    # the headers are built when the client is made
+    for code in CODES:
+        PAYLOADS.get(code)
+
+
+def send_key_presses(api, codes, requests):
+    start = clock()
+    for i in range(requests):
+        api.ircc(codes[i % len(codes)])
+    return (clock() - start) / requests
+
+
+def end_to_end(requests):
+    with Emulator(upnp_port=None, psk=PSK) as tv:
+        api = _sony_api.SonyAPI(
+            ip_address=tv.address,
+            psk=PSK,
+            nickname='benchmark',
+            response_cache=False,
+            retry=False,
+            circuit_breaker=False
+        )
+        codes = list(tv.command_list.values())
+        payloads = api._ircc_payloads
+
+        # warm up the connection pool
+        send_key_presses(api, codes, 10)
+
+        # without payloads _ircc formats the envelope on every call
+        api._ircc_payloads = {}
+        formatted = send_key_presses(api, codes, requests)
+        api._ircc_payloads = payloads
+        precompiled = send_key_presses(api, codes, requests)
+        api.close()
+
+    return formatted, precompiled
+
+
+def main():
+    if len(sys.argv) > 1:
+        iterations = int(sys.argv[1])
+    else:
+        iterations = 10000
+
+    if len(sys.argv) > 2:
+        requests = int(sys.argv[2])
+    else:
+        requests = 1000
+
+    print('payload and headers only (no request is sent)')
+    results = []
+    for label, func in (('before', before), ('after', after)):
+        seconds = min(timeit.repeat(func, number=iterations, repeat=5))
+        per_key = seconds / (iterations * len(CODES)) * 1e9
+        results += [per_key]
+        print('  %-11s %10.1f ns per key press' % (label, per_key))
+
+    print('  speedup %.1fx' % (results[0] / results[1]))
+
+    print('SonyAPI.ircc against the emulator')
+    formatted, precompiled = end_to_end(requests)
+    print('  %-11s %10.1f us per key press' % ('formatted', formatted * 1e6))
+    print(
+        '  %-11s %10.1f us per key press' %
+        ('precompiled', precompiled * 1e6)
+    )
+    print('  speedup %.2fx' % (formatted / precompiled))
+
+
+if __name__ == '__main__':
+    main()
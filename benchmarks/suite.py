@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+#
+# SonyAPI
+# External control of Sony Bravia Generation 3 TV's
+# Copyright (C) 2017  Kevin G. Schlosser
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# End to end benchmarks run against the emulated TV. The results are
+# written as JSON so two runs can be compared.
+#
+#   python benchmarks/suite.py [--quick] [--only name,...]
+#       [--scenario file.json] [--output results.json]
+#   python benchmarks/suite.py --compare old.json new.json
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import SonyAPI as _sony_api  # NOQA
+from SonyAPI import media, utils, codec  # NOQA
+from SonyAPI.metrics import clock  # NOQA
+from SonyAPI.emulator import Emulator  # NOQA
+
+PSK = '0000'
+SOURCE = 'tv:dvbt'
+
+
+def client(tv, **kwargs):
+    kwargs.setdefault('response_cache', False)
+    kwargs.setdefault('coalesce_reads', False)
+    kwargs.setdefault('retry', False)
+    kwargs.setdefault('circuit_breaker', False)
+    return _sony_api.SonyAPI(
+        ip_address=tv.address,
+        psk=PSK,
+        nickname='benchmark',
+        **kwargs
+    )
+
+
+def percentile(samples, pct):
+    index = int(round(pct / 100.0 * (len(samples) - 1)))
+    return samples[index]
+
+
+def summary(samples, elapsed):
+    samples = sorted(samples)
+    return dict(
+        count=len(samples),
+        ops_per_sec=len(samples) / elapsed,
+        mean_ms=sum(samples) / len(samples) * 1000,
+        p50_ms=percentile(samples, 50) * 1000,
+        p90_ms=percentile(samples, 90) * 1000,
+        p99_ms=percentile(samples, 99) * 1000,
+        max_ms=samples[-1] * 1000
+    )
+
+
+def timed(func, repeat):
+    # best of repeat, in seconds
+    best = None
+    for _ in range(repeat):
+        start = clock()
+        func()
+        duration = clock() - start
+        if best is None or duration < best:
+            best = duration
+    return best
+
+
+def run_threads(count, target):
+    threads = list(threading.Thread(target=target) for _ in range(count))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def bench_send_latency(tv, options):
+    api = client(tv)
+    samples = []
+
+    start = clock()
+    for _ in range(options.requests):
+        call_start = clock()
+        api.send('system', 'getPowerStatus')
+        samples += [clock() - call_start]
+
+    result = summary(samples, clock() - start)
+    api.connection_pool.close()
+    return result
+
+
+def bench_send_throughput(tv, options):
+    api = client(tv, pool_size=options.threads)
+    samples = []
+    lock = threading.Lock()
+    per_thread = max(1, options.requests // options.threads)
+
+    def worker():
+        local = []
+        for _ in range(per_thread):
+            call_start = clock()
+            api.send('system', 'getPowerStatus')
+            local += [clock() - call_start]
+        with lock:
+            samples.extend(local)
+
+    start = clock()
+    run_threads(options.threads, worker)
+    result = summary(samples, clock() - start)
+    result['threads'] = options.threads
+    api.connection_pool.close()
+    return result
+
+
+def bench_ircc(tv, options):
+    api = client(tv)
+    codes = list(tv.command_list.values())
+    samples = []
+
+    start = clock()
+    for i in range(options.requests):
+        call_start = clock()
+        api.ircc(codes[i % len(codes)])
+        samples += [clock() - call_start]
+
+    result = summary(samples, clock() - start)
+    api.connection_pool.close()
+    return result
+
+
+def bench_command_list(tv, options):
+    api = client(tv)
+    results = {}
+
+    for workers in (1, 8):
+        api._discovery_workers = workers
+        results['workers_%d_ms' % workers] = timed(
+            api._build_command_list,
+            options.repeat
+        ) * 1000
+
+    api.connection_pool.close()
+    return results
+
+
+def bench_content(tv, options):
+    api = client(tv)
+    results = {}
+
+    for count in options.sizes:
+        tv.set_content(SOURCE, count=count)
+
+        results['content_list_%d_ms' % count] = timed(
+            lambda: list(api.content_list),
+            options.repeat
+        ) * 1000
+        results['lineup_%d_ms' % count] = timed(
+            lambda: api.channel.lineup,
+            options.repeat
+        ) * 1000
+
+    tv.set_content(SOURCE, items=[])
+    api.connection_pool.close()
+    return results
+
+
+def bench_content_item(tv, options):
+    api = client(tv)
+    tv.set_content(SOURCE, count=options.sizes[0])
+    content_list = api.send('avContent', 'getContentList', source=SOURCE)
+    source = next(iter(api.source_list))
+
+    def build():
+        for content in content_list:
+            content['source'] = source
+            media.ContentItem(api, **content)
+
+    seconds = timed(build, options.repeat)
+    tv.set_content(SOURCE, items=[])
+    api.connection_pool.close()
+    return dict(
+        items=len(content_list),
+        ns_per_item=seconds / len(content_list) * 1e9
+    )
+
+
+def bench_icons(tv, options):
+    tv.set_applications(options.icons)
+    api = client(tv)
+
+    def cache():
+        api.icon_cache.clear()
+        utils.cache_icons(api, threading.Event())
+
+    seconds = timed(cache, options.repeat)
+    cached = len(api.icon_cache)
+    api.connection_pool.close()
+    return dict(
+        icons=cached,
+        total_ms=seconds * 1000,
+        ms_per_icon=seconds / max(1, cached) * 1000
+    )
+
+
+BENCHMARKS = (
+    ('send_latency', bench_send_latency),
+    ('send_throughput', bench_send_throughput),
+    ('ircc', bench_ircc),
+    ('command_list', bench_command_list),
+    ('content', bench_content),
+    ('content_item', bench_content_item),
+    ('icons', bench_icons),
+)
+
+
+def run(options):
+    only = set(options.only.split(',')) if options.only else None
+    results = {}
+
+    tv = Emulator(upnp_port=None, psk=PSK, scenario=options.scenario)
+    with tv:
+        for name, func in BENCHMARKS:
+            if only is not None and name not in only:
+                continue
+            print('running %s...' % name, file=sys.stderr)
+            results[name] = func(tv, options)
+
+    return dict(
+        meta=dict(
+            timestamp=time.strftime('%Y-%m-%dT%H:%M:%S'),
+            python=platform.python_version(),
+            implementation=platform.python_implementation(),
+            platform=platform.platform(),
+            version=_sony_api.__version__,
+            codec=codec.CODEC.name,
+            scenario=options.scenario,
+            quick=options.quick
+        ),
+        results=results
+    )
+
+
+def print_results(report):
+    for name in sorted(report['results']):
+        print(name)
+        values = report['results'][name]
+        for key in sorted(values):
+            print('    %-22s %12.3f' % (key, values[key]))
+
+
+def compare(old, new):
+    # prints every metric found in both runs with the change in percent
+    for name in sorted(new['results']):
+        if name not in old['results']:
+            continue
+        print(name)
+        old_values = old['results'][name]
+        new_values = new['results'][name]
+
+        for key in sorted(new_values):
+            if key not in old_values:
+                continue
+            before = old_values[key]
+            after = new_values[key]
+            if before:
+                change = '%+7.1f%%' % ((after - before) / float(before) * 100)
+            else:
+                change = '       '
+            print(
+                '    %-22s %12.3f %12.3f %s' % (key, before, after, change)
+            )
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def run_options(options):
+    if options.quick:
+        options.sizes = (1000,)
+        defaults = dict(requests=200, repeat=1)
+    else:
+        options.sizes = (1000, 10000)
+        defaults = dict(requests=2000, repeat=3)
+
+    for key, value in defaults.items():
+        if getattr(options, key) is None:
+            setattr(options, key, value)
+
+    report = run(options)
+
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--quick', action='store_true')
+    parser.add_argument('--only', default=None)
+    parser.add_argument('--scenario', default=None)
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--requests', type=int, default=None)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=None)
+    parser.add_argument('--icons', type=int, default=50)
+    parser.add_argument('--compare', nargs='+', metavar='RESULTS')
+    options = parser.parse_args()
+
+    if options.compare:
+        if len(options.compare) == 1:
+            new = run_options(options)
+        else:
+            new = load(options.compare[1])
+        compare(load(options.compare[0]), new)
+        return
+
+    print_results(run_options(options))
+
+
+if __name__ == '__main__':
+    main()